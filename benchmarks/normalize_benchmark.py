@@ -0,0 +1,53 @@
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalize import SubtitleNormalizer  # noqa: E402
+
+CUE = '{index}\r\n00:{minutes:02d}:{seconds:02d},000 --> 00:{minutes:02d}:{seconds:02d},900\r\nLínea de subtítulo número {index} con acentos y eñes\r\n\r\n'
+
+ENCODINGS = ('utf-8', 'utf-8-sig', 'cp1252', 'utf-16')
+
+
+def build_subtitle(cues, encoding):
+	text = ''.join(CUE.format(index=i + 1, minutes=(i // 60) % 60, seconds=i % 60) for i in range(cues))
+	return text.encode(encoding)
+
+
+def ascii_then_cp1252(cues):
+	# Worst case for detection: a long ASCII prefix and a legacy byte past the sample
+	head = ''.join(CUE.format(index=i + 1, minutes=(i // 60) % 60, seconds=i % 60) for i in range(cues)).encode('ascii', 'ignore')
+	return head + '{}\r\n00:00:00,000 --> 00:00:01,000\r\nCanción\r\n\r\n'.format(cues + 1).encode('cp1252')
+
+
+def run(name, data, repeat):
+	best = None
+	for _ in range(repeat):
+		normalizer = SubtitleNormalizer()
+		start = time.perf_counter()
+		validator = normalizer.normalize(io.BytesIO(data), io.BytesIO())
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+
+	size = len(data) / (1024 * 1024)
+	print(f'{name:<18} {size:8.2f} MB {best * 1000:9.1f} ms {size / best:8.1f} MB/s '
+		  f'encoding={normalizer.encoding} cues={validator.cues} errors={validator.errors}')
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Measure subtitle normalization throughput')
+	parser.add_argument('--cues', type=int, default=50000, help='Cues per generated subtitle')
+	parser.add_argument('--repeat', type=int, default=5, help='Runs per sample, the best one is reported')
+	args = parser.parse_args()
+
+	for encoding in ENCODINGS:
+		run(encoding, build_subtitle(args.cues, encoding), args.repeat)
+	run('ascii+cp1252', ascii_then_cp1252(args.cues), args.repeat)
+
+
+if __name__ == '__main__':
+	main()
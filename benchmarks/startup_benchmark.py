@@ -0,0 +1,58 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module, root=ROOT):
+	# Cumulative microseconds per module as reported by -X importtime
+	result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+							cwd=root, capture_output=True, text=True)
+	if result.returncode != 0:
+		raise SystemExit(result.stderr)
+
+	times = []
+	for line in result.stderr.splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		_, cumulative, name = line[len('import time:'):].split('|')
+		times.append((int(cumulative), name.strip()))
+	return times
+
+
+def noop_run(repeat, root=ROOT):
+	# A scan of an empty folder: everything the downloader pays for before finding work
+	best = None
+	with tempfile.TemporaryDirectory() as folder:
+		for _ in range(repeat):
+			start = time.perf_counter()
+			subprocess.run([sys.executable, 'download.py', '--folder', folder], cwd=root,
+						   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+			elapsed = time.perf_counter() - start
+			best = elapsed if best is None else min(best, elapsed)
+	return best
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Measure downloader startup cost')
+	parser.add_argument('--module', default='download', help='Module whose import is measured')
+	parser.add_argument('--top', type=int, default=15, help='Slowest top level imports to list')
+	parser.add_argument('--repeat', type=int, default=3, help='No-op runs, the best one is reported')
+	parser.add_argument('--root', default=ROOT, help='Tree to measure, e.g. a worktree of an older commit to compare with')
+	args = parser.parse_args()
+
+	times = import_times(args.module, args.root)
+	total = next(cumulative for cumulative, name in reversed(times) if name == args.module)
+	print(f'import {args.module}: {total / 1000:.1f} ms')
+	for cumulative, name in sorted(times, reverse=True)[:args.top]:
+		print(f'  {cumulative / 1000:9.1f} ms  {name}')
+
+	print(f'no-op run: {noop_run(args.repeat, args.root) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+	main()
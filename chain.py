@@ -0,0 +1,177 @@
+import time
+from exceptions import (CircuitOpenException, LoginException, LogoutException,
+						ParseResponseException, ServiceUnavailableException,
+						SubtitlesNotFoundException, TooManyTriesException)
+
+import requests
+from guessit import guessit
+
+from log import get_logger
+from providers.bsplayer import BSPlayer
+from providers.subdivx import Subdivx
+from resilience import get_breaker
+
+logger = get_logger('ProviderChain')
+bsplayer_logger = get_logger('BSPlayer')
+subdivx_logger = get_logger('Subdivx')
+loggers = {'bsplayer': bsplayer_logger, 'subdivx': subdivx_logger}
+
+
+class ProviderChain:
+	PROVIDERS = ('bsplayer', 'subdivx')
+
+	def __init__(self, proxy_pool, bsplayer_timeout=5, bsplayer_tries=5, bsplayer_session=None, subdivx_prefetch=3, stats=None):
+		self.proxy_pool = proxy_pool
+		self.bsplayer_timeout = bsplayer_timeout
+		self.bsplayer_tries = bsplayer_tries
+		self.bsplayer_session = bsplayer_session
+		self.subdivx_prefetch = subdivx_prefetch
+		self.stats = stats
+		self._bsplayer = None
+		self._subdivx = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+	@property
+	def bsplayer(self):
+		# Providers are opened on first use and kept open until the chain is closed
+		if self._bsplayer is None:
+			bsplayer = BSPlayer(bsplayer_logger, self.proxy_pool, timeout=self.bsplayer_timeout, tries=self.bsplayer_tries, session=self.bsplayer_session)
+			self._bsplayer = bsplayer.__enter__()
+		return self._bsplayer
+
+	@property
+	def subdivx(self):
+		if self._subdivx is None:
+			subdivx = Subdivx(subdivx_logger, self.proxy_pool, prefetch=self.subdivx_prefetch)
+			self._subdivx = subdivx.__enter__()
+		return self._subdivx
+
+	def close(self):
+		if self._bsplayer is not None:
+			try:
+				self._bsplayer.__exit__(None, None, None)
+			except TooManyTriesException:
+				bsplayer_logger.error(f'Logout failed - too many tries')
+			except LogoutException:
+				bsplayer_logger.error(f'BS.Player failed')
+			except:
+				bsplayer_logger.error(f'Unknown error')
+			self._bsplayer = None
+
+		if self._subdivx is not None:
+			try:
+				self._subdivx.__exit__(None, None, None)
+			except:
+				subdivx_logger.error(f'Unknown error')
+			self._subdivx = None
+
+		if self.stats is not None:
+			try:
+				self.stats.save()
+			except OSError:
+				logger.error(f'Provider stats could not be saved')
+
+	def open(self, provider):
+		# A failure here counts against the provider breaker, which decides when to try again
+		try:
+			if provider == 'bsplayer':
+				self.bsplayer
+			else:
+				self.subdivx
+			return True
+		except TooManyTriesException:
+			bsplayer_logger.error(f'Login failed - too many tries')
+		except CircuitOpenException as ex:
+			loggers[provider].error(f'{ex}')
+		except (LoginException, LogoutException):
+			bsplayer_logger.error(f'BS.Player failed')
+		except:
+			loggers[provider].error(f'Unknown error')
+
+		return False
+
+	# Both return False when the provider could not be reached, so it counts against its circuit breaker
+	def bsplayer_download(self, video_path, languages):
+		for language in list(languages):
+			try:
+				downloaded = self.bsplayer.download_by_path(video_path, language=language)
+				if downloaded:
+					languages.remove(language)
+			except SubtitlesNotFoundException:
+				bsplayer_logger.error(f'Subtitles not found for {video_path} ({language})')
+			except TooManyTriesException:
+				bsplayer_logger.error(f'Request failed - too many tries for {video_path}')
+				return False
+			except CircuitOpenException as ex:
+				bsplayer_logger.error(f'{ex} for {video_path}')
+				return False
+			except Exception as ex:
+				bsplayer_logger.error(f'{ex} for {video_path}')
+			except:
+				continue
+		return True
+
+	def subdivx_download(self, video_path, languages):
+		try:
+			downloaded = self.subdivx.download_by_path(video_path)
+			if downloaded:
+				languages.remove(Subdivx.LANGUAGE)
+		except SubtitlesNotFoundException:
+			subdivx_logger.error(f'Subtitles not found for {video_path}')
+		except (CircuitOpenException, ServiceUnavailableException, requests.exceptions.RequestException) as ex:
+			subdivx_logger.error(f'{ex} for {video_path}')
+			return False
+		except (ParseResponseException, Exception) as ex:
+			subdivx_logger.error(f'{ex} for {video_path}')
+		except:
+			pass
+		return True
+
+	def wants(self, provider, languages):
+		if provider == 'subdivx':
+			return Subdivx.LANGUAGE in languages
+		return bool(languages)
+
+	def process(self, video_path, languages):
+		# Downloaded languages are removed from the list, returns True when none is left
+		providers = self.PROVIDERS
+		buckets = None
+		if self.stats is not None:
+			try:
+				buckets = self.stats.buckets(video_path, guessit(video_path))
+				providers = self.stats.order(buckets, self.PROVIDERS)
+			except:
+				buckets = None
+
+		downloaders = {'bsplayer': self.bsplayer_download, 'subdivx': self.subdivx_download}
+		for provider in providers:
+			if not self.wants(provider, languages):
+				continue
+
+			breaker = get_breaker(provider)
+			try:
+				breaker.before_call()
+			except CircuitOpenException as ex:
+				loggers[provider].debug('{} for {}', ex, video_path)
+				continue
+
+			if not self.open(provider):
+				breaker.failure()
+				continue
+
+			pending = len(languages)
+			start = time.monotonic()
+			if not downloaders[provider](video_path, languages):
+				breaker.failure()
+				continue
+
+			breaker.success()
+			if buckets is not None:
+				self.stats.record(buckets, provider, len(languages) < pending, time.monotonic() - start)
+
+		return not languages
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import time
+import uuid
+
+
+class Cluster:
+	def __init__(self, node, nodes, lease_folder, search_folder, lease_ttl=3600, logger=None):
+		if node not in nodes:
+			raise ValueError(f'Node {node} is not part of the cluster nodes')
+
+		self.node = node
+		self.nodes = sorted(nodes)
+		self.lease_folder = lease_folder
+		self.search_folder = search_folder
+		self.lease_ttl = lease_ttl
+		self.logger = logger
+		self._leases = {}
+		self._heartbeat = 0
+		os.makedirs(os.path.join(self.lease_folder, 'nodes'), exist_ok=True)
+
+	def key(self, video_path):
+		# Nodes may mount the share in different places, so hash the path relative to the library
+		relative_path = os.path.relpath(video_path, self.search_folder).replace(os.sep, '/')
+		return hashlib.sha1(relative_path.encode('utf-8')).hexdigest()
+
+	def owner(self, video_path):
+		return self.nodes[int(self.key(video_path), 16) % len(self.nodes)]
+
+	def heartbeat(self, force=True):
+		# Refreshed often enough during long runs that other nodes never take us for dead
+		now = time.time()
+		if not force and now - self._heartbeat < self.lease_ttl / 10:
+			return
+
+		heartbeat_file = os.path.join(self.lease_folder, 'nodes', self.node)
+		try:
+			with open(heartbeat_file, 'a'):
+				os.utime(heartbeat_file, None)
+		except OSError as ex:
+			# The share may come back, the next call tries again
+			if self.logger is not None:
+				self.logger.warning(f'Error refreshing heartbeat: {ex}')
+			return
+		self._heartbeat = now
+
+	def is_alive(self, node):
+		heartbeat_file = os.path.join(self.lease_folder, 'nodes', node)
+		try:
+			return time.time() - os.path.getmtime(heartbeat_file) <= self.lease_ttl
+		except OSError:
+			return False
+
+	def lease_file(self, video_path):
+		return os.path.join(self.lease_folder, self.key(video_path) + '.lease')
+
+	def read_token(self, lease_file):
+		try:
+			with open(lease_file, 'r') as f:
+				return f.readline().strip()
+		except OSError:
+			return None
+
+	def break_stale(self, lease_file):
+		try:
+			if time.time() - os.path.getmtime(lease_file) <= self.lease_ttl:
+				return
+		except OSError:
+			return
+
+		# Renaming is atomic, so only one node can take the stale lease away
+		taken_file = f'{lease_file}.{uuid.uuid4().hex}.stale'
+		try:
+			os.rename(lease_file, taken_file)
+		except OSError:
+			return
+
+		try:
+			if time.time() - os.path.getmtime(taken_file) <= self.lease_ttl:
+				# Another node replaced the stale lease in the meantime, give its fresh lease back
+				try:
+					os.link(taken_file, lease_file)
+				except OSError:
+					pass
+		finally:
+			os.remove(taken_file)
+
+	def acquire(self, video_path):
+		lease_file = self.lease_file(video_path)
+		self.break_stale(lease_file)
+
+		try:
+			fd = os.open(lease_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+		except FileExistsError:
+			return False
+
+		token = f'{self.node}:{uuid.uuid4().hex}'
+		with os.fdopen(fd, 'w') as f:
+			f.write(f'{token}\n{video_path}\n')
+
+		self._leases[lease_file] = token
+		return True
+
+	def renew(self, video_path):
+		# Called when a worker starts on the file, the lease may have waited in the queue for a while
+		self.heartbeat(force=False)
+
+		lease_file = self.lease_file(video_path)
+		token = self._leases.get(lease_file)
+		if token is None or self.read_token(lease_file) != token:
+			self._leases.pop(lease_file, None)
+			return False
+
+		try:
+			os.utime(lease_file, None)
+		except OSError:
+			return False
+		return True
+
+	def release(self, video_path=None):
+		if video_path is None:
+			lease_files = list(self._leases)
+		else:
+			lease_files = [self.lease_file(video_path)]
+
+		for lease_file in lease_files:
+			token = self._leases.pop(lease_file, None)
+			# Never remove a lease another node has taken over
+			if token is not None and self.read_token(lease_file) == token:
+				try:
+					os.remove(lease_file)
+				except OSError:
+					pass
+
+	def alive_nodes(self):
+		return {node: self.is_alive(node) for node in self.nodes}
+
+	def steal(self, video_files, idle, steal_limit=None, alive=None):
+		# Take files from dead nodes, and from any node when there is nothing left of our own
+		if alive is None:
+			alive = self.alive_nodes()
+		stolen = []
+		for video_path in video_files:
+			if steal_limit is not None and len(stolen) >= steal_limit:
+				break
+			if (idle or not alive[self.owner(video_path)]) and self.acquire(video_path):
+				stolen.append(video_path)
+		return stolen
+
+	def claim(self, video_files, steal_limit=None, idle_limit=100):
+		# Yields the (video path, languages) pairs this node works on while the scan goes on
+		self.heartbeat()
+		alive = self.alive_nodes()
+		if steal_limit is not None:
+			idle_limit = min(idle_limit, steal_limit)
+
+		claimed = 0
+		stolen = 0
+		# Files of live nodes only wait for the end of the scan, and never more than could be stolen
+		idle_files = {}
+		for video_path, languages in video_files:
+			self.heartbeat(force=False)
+			owner = self.owner(video_path)
+			if owner == self.node:
+				if not self.acquire(video_path):
+					continue
+				claimed += 1
+			elif alive[owner]:
+				if len(idle_files) < idle_limit:
+					idle_files[video_path] = languages
+				continue
+			else:
+				# A dead node's files are taken right away
+				if steal_limit is not None and stolen >= steal_limit:
+					continue
+				if not self.acquire(video_path):
+					continue
+				stolen += 1
+			yield video_path, languages
+
+		if not claimed:
+			remaining = steal_limit - stolen if steal_limit is not None else None
+			for video_path in self.steal(idle_files, True, steal_limit=remaining, alive=alive):
+				stolen += 1
+				yield video_path, idle_files[video_path]
+
+		if self.logger is not None:
+			self.logger.info(f'{claimed} file(s) claimed and {stolen} file(s) stolen by node {self.node}')
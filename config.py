@@ -1,10 +1,32 @@
 SEARCH_FOLDER = "/media" # Folder to recursively search subtitles
 BSPLAYER_TIMEOUT = 10 # Timeout for each request against BS.Player server
 BSPLAYER_TRIES = 5 # Amount of tries for each request against BS.Player server
+BSPLAYER_SESSION_FILE = "/logs/bsplayer-session.json" # File to keep the BS.Player session between runs (None to log in and out every run)
+BSPLAYER_SESSION_TTL = 86400 # Seconds to reuse a kept BS.Player session before logging in again
+LANGUAGES = ["spa"] # Subtitle languages to search (ISO 639-3 codes, subdivx only serves "spa")
+SUBDIVX_PREFETCH = 3 # Amount of subdivx candidates fetched concurrently, the next one is used when an archive has no usable subtitle
+PROVIDER_STATS_FILE = "/logs/provider-stats.json" # File with the learned provider hit rates used to order or skip providers per file (None for the fixed order)
+BREAKER_FAILURES = 5 # Consecutive failures until a provider or mirror is skipped for the rest of the run
+BREAKER_RESET_TIMEOUT = 300 # Seconds until a skipped provider or mirror is probed again
+BACKOFF_BASE = 1 # Seconds for the first retry delay, doubled on each try (with random jitter)
+BACKOFF_CAP = 30 # Max seconds between retries
+PROVIDER_WORKERS = 1 # Threads downloading subtitles while the library is still being scanned
+SCAN_QUEUE_SIZE = 100 # Max scanned files waiting for a provider worker
+POOL_MAXSIZE = 10 # Keep-alive connections kept per host, shared by all the providers
+DNS_CACHE_TTL = 300 # Seconds to cache host name lookups (None to disable)
 AGE = 10 # Files days age for search the subtitles
 EMBEDDED = True # Skip files with embedded audio or subtitle (only for MKV)
 VERBOSE = False # Verbose log console output
+LOG_LEVEL = "INFO" # Log level (DEBUG adds a line for every skipped file and request try)
 FILE_LOG = True # File log support
 FILE_LOG_FOLDER = "/logs" # File log folder
 USE_PROXY = False # Use proxy
+CLUSTER_NODE = None # Name of this node when several hosts share the same library (None to disable cluster mode)
+CLUSTER_NODES = [] # Names of all the nodes sharing the library
+CLUSTER_LEASE_FOLDER = "/media/.subtitles-leases" # Shared folder for file leases and node heartbeats
+CLUSTER_LEASE_TTL = 3600 # Seconds until a lease or heartbeat from another node is considered dead
+CLUSTER_STEAL_LIMIT = 50 # Max files to take over from other nodes per run (None for no limit)
+SERVER_HOST = "127.0.0.1" # Address for the single file requests server (server.py)
+SERVER_PORT = 8088 # Port for the single file requests server
+SERVER_IDLE_TIMEOUT = 300 # Seconds without requests until the server closes the provider sessions
 WS_SLEEP = 600 # Seconds to wait until resume subtitles searching (only for Windows Service)
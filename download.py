@@ -1,19 +1,21 @@
 import asyncio
-import os
+import queue
 import sys
+import threading
 from argparse import ArgumentParser
-from exceptions import (ParseResponseException, ServiceUnavailableException,
-						SubtitlesNotFoundException, TooManyTriesException,
-						LoginException, LogoutException)
 from itertools import cycle
 
-import logbook
-from proxybroker import Broker
-
 import config as cfg
+from cluster import Cluster
 from files import GetFiles
-from providers.bsplayer import BSPlayer
-from providers.subdivx import Subdivx
+from log import LogPipeline, get_logger
+from resilience import configure as configure_resilience
+from session import BSPlayerSession
+from stats import ProviderStats
+from transport import configure as configure_transport
+from transport import get_active_transport
+
+logger = get_logger('General')
 
 
 async def read_queue(queue, proxies):
@@ -24,89 +26,113 @@ async def read_queue(queue, proxies):
 		proxies.add('%s:%d' % (proxy.host, proxy.port))
 
 def get_proxies(proxies):
-	queue = asyncio.Queue()
-	broker = Broker(queue)
-	tasks = asyncio.gather(broker.find(types=['HTTPS'], limit=10), read_queue(queue, proxies))
-	loop = asyncio.get_event_loop()
-	loop.run_until_complete(tasks)
-
-def bsplayer_provider(logger, proxy_pool, timeout, tries, video_files, language):
-	if video_files:
-		try:
-			with BSPlayer(logger, proxy_pool, timeout=timeout, tries=tries) as bsplayer:
-				for video_path in list(video_files):
-					try:
-						downloaded = bsplayer.download_by_path(video_path, language=language)	
-						if downloaded:
-							video_files.remove(video_path)
-					except SubtitlesNotFoundException:
-						logger.error(f'Subtitles not found for {video_path}')
-					except TooManyTriesException:
-						logger.error(f'Request failed - too many tries for {video_path}')
-					except Exception as ex:
-						logger.error(f'{ex} for {video_path}')
-					except:
-						continue
-		except TooManyTriesException:
-			logger.error(f'Login failed - too many tries')
-		except (LoginException, LogoutException):
-			logger.error(f'BS.Player failed')
-		except:
-			logger.error(f'Unknown error')
-		finally:
-			if video_files: logger.info(f'{len(video_files)} file(s) still pending to be subtitled')
-			logger.name = "General"
+	from proxybroker import Broker
+
+	# Own event loop, this runs on the provider worker threads where there is none
+	loop = asyncio.new_event_loop()
+	asyncio.set_event_loop(loop)
+	try:
+		proxy_queue = asyncio.Queue()
+		broker = Broker(proxy_queue)
+		tasks = asyncio.gather(broker.find(types=['HTTPS'], limit=10), read_queue(proxy_queue, proxies))
+		loop.run_until_complete(tasks)
+	finally:
+		asyncio.set_event_loop(None)
+		loop.close()
 
-def subdivx_provider(logger, proxy_pool, video_files):
-	if video_files:
+def process_queue(video_queue, open_chain, pending_files, cluster=None):
+	chain = None
+	try:
+		while True:
+			item = video_queue.get()
+			if item is None:
+				break
+
+			video_path, languages = item
+			# Nothing may escape this try, a dead worker would leave the scan blocked on a full queue
+			try:
+				if cluster is not None and not cluster.renew(video_path):
+					logger.info(f'Lease lost for {video_path}, left to the node that took it over')
+					continue
+
+				if chain is None:
+					chain = open_chain()
+				if not chain.process(video_path, languages):
+					pending_files.append(video_path)
+			except:
+				logger.error(f'Error: {sys.exc_info()} for {video_path}')
+				pending_files.append(video_path)
+	finally:
+		if chain is not None:
+			chain.close()
+
+def download(search_folder, age=5, embedded=True, language="spa", bsplayer_timeout=5, bsplayer_tries=5, bsplayer_session_file=None, bsplayer_session_ttl=None, subdivx_prefetch=3, provider_stats_file=None, breaker_failures=5, breaker_reset_timeout=300, backoff_base=1.0, backoff_cap=30.0, pool_maxsize=10, dns_cache_ttl=300, provider_workers=1, scan_queue_size=100, verbose=False, log_level="INFO", file_log=True, file_log_folder="logs", use_proxy=True, cluster_node=None, cluster_nodes=None, cluster_lease_folder=None, cluster_lease_ttl=3600, cluster_steal_limit=None):
+	with LogPipeline(level=log_level, verbose=verbose, file_log=file_log, file_log_folder=file_log_folder):
+		configure_resilience(failure_threshold=breaker_failures, reset_timeout=breaker_reset_timeout, backoff_base=backoff_base, backoff_cap=backoff_cap)
+		configure_transport(pool_maxsize=pool_maxsize, dns_ttl=dns_cache_ttl)
+
+		cluster = None
 		try:
-			with Subdivx(logger, proxy_pool) as subdivx:
-				for video_path in list(video_files):
-					try:
-						downloaded = subdivx.download_by_path(video_path)	
-						if downloaded:
-							video_files.remove(video_path)
-					except SubtitlesNotFoundException:
-						logger.error(f'Subtitles not found for {video_path}')
-					except (ParseResponseException, ServiceUnavailableException, Exception) as ex:
-						logger.error(f'{ex} for {video_path}')
-					except:
-						continue
-		except:
-			logger.error(f'Unknown error')
-		finally:
-			if video_files: logger.info(f'{len(video_files)} file(s) still pending to be subtitled')
-			logger.name = "General"	  
+			logger.info(f'Subtitles Downloader started') 
 
-def download(search_folder, age=5, embedded=True, language="spa", bsplayer_timeout=5, bsplayer_tries=5, verbose=False, file_log=True, file_log_folder="logs", use_proxy=True):
-	logger = logbook.Logger('General')
-	if verbose:
-		logger.handlers.append(logbook.StreamHandler(sys.stdout, bubble=True))
-	if file_log:
-		log_file = os.path.join(file_log_folder, 'subtitles.log')
-		logger.handlers.append(logbook.TimedRotatingFileHandler(log_file, date_format='%Y-%m-%d'))
+			bsplayer_session = None
+			if bsplayer_session_file:
+				bsplayer_session = BSPlayerSession(bsplayer_session_file, ttl=bsplayer_session_ttl)
 
-	try:
-		logger.info(f'Subtitles Downloader started') 
-
-		video_files = GetFiles(search_folder, language=language, age=age, embedded=embedded, logger=logger).qualified_files
-		
-		if video_files:
-			proxy_pool = None
-			
-			if use_proxy:
-				logger.info(f'Getting a list of proxies')
-				
-				proxies = set()
-				get_proxies(proxies)
-				proxy_pool = cycle(proxies)
-
-			bsplayer_provider(logger, proxy_pool, bsplayer_timeout, bsplayer_tries, video_files, language)
-			subdivx_provider(logger, proxy_pool, video_files)
-	except:
-		logger.error(f'Error: {sys.exc_info()}')
-	else:
-		logger.info(f'Subtitles Downloader finished')				
+			provider_stats = None
+			if provider_stats_file:
+				provider_stats = ProviderStats(provider_stats_file)
+
+			proxy_pool = []
+			proxy_pool_lock = threading.Lock()
+
+			def open_chain():
+				# Providers, their dependencies and the proxies are only loaded once the first file needs them
+				from chain import ProviderChain
+
+				with proxy_pool_lock:
+					if use_proxy and not proxy_pool:
+						logger.info(f'Getting a list of proxies')
+						proxies = set()
+						get_proxies(proxies)
+						proxy_pool.append(cycle(proxies))
+				return ProviderChain(proxy_pool[0] if proxy_pool else None, bsplayer_timeout=bsplayer_timeout, bsplayer_tries=bsplayer_tries, bsplayer_session=bsplayer_session, subdivx_prefetch=subdivx_prefetch, stats=provider_stats)
+
+			# Files are handed to the provider workers while the scan goes on, the bounded queue keeps memory flat
+			video_queue = queue.Queue(maxsize=scan_queue_size)
+			pending_files = []
+			if cluster_node:
+				cluster = Cluster(cluster_node, cluster_nodes, cluster_lease_folder, search_folder, lease_ttl=cluster_lease_ttl, logger=get_logger('Cluster'))
+				cluster.heartbeat()
+
+			workers = [threading.Thread(target=process_queue, args=(video_queue, open_chain, pending_files, cluster), daemon=True) for i in range(max(1, provider_workers))]
+			for worker in workers:
+				worker.start()
+
+			try:
+				video_files = GetFiles(search_folder, language=language, age=age, embedded=embedded, logger=get_logger('GetFiles')).iter_qualified()
+				if cluster is not None:
+					video_files = cluster.claim(video_files, steal_limit=cluster_steal_limit, idle_limit=scan_queue_size)
+				for video_path, languages in video_files:
+					video_queue.put((video_path, languages))
+			finally:
+				for worker in workers:
+					video_queue.put(None)
+				for worker in workers:
+					worker.join()
+
+			if pending_files: logger.info(f'{len(pending_files)} file(s) still pending to be subtitled')
+
+			transport = get_active_transport()
+			if transport is not None:
+				logger.info('{requests} request(s) sent over {connections} connection(s), {reused} reused', **transport.stats())
+		except:
+			logger.error(f'Error: {sys.exc_info()}')
+		else:
+			logger.info(f'Subtitles Downloader finished')
+		finally:
+			if cluster is not None:
+				cluster.release()
 
 if __name__ == '__main__':
 	parser = ArgumentParser()
@@ -118,4 +144,4 @@ if __name__ == '__main__':
 		cfg.EMBEDDED = True
 		cfg.VERBOSE = True
 
-	download(cfg.SEARCH_FOLDER, age=cfg.AGE, embedded=cfg.EMBEDDED, bsplayer_timeout=cfg.BSPLAYER_TIMEOUT, bsplayer_tries=cfg.BSPLAYER_TRIES, verbose=cfg.VERBOSE, file_log=cfg.FILE_LOG, file_log_folder=cfg.FILE_LOG_FOLDER, use_proxy=cfg.USE_PROXY)
+	download(cfg.SEARCH_FOLDER, age=cfg.AGE, language=cfg.LANGUAGES, embedded=cfg.EMBEDDED, bsplayer_timeout=cfg.BSPLAYER_TIMEOUT, bsplayer_tries=cfg.BSPLAYER_TRIES, bsplayer_session_file=cfg.BSPLAYER_SESSION_FILE, bsplayer_session_ttl=cfg.BSPLAYER_SESSION_TTL, subdivx_prefetch=cfg.SUBDIVX_PREFETCH, provider_stats_file=cfg.PROVIDER_STATS_FILE, breaker_failures=cfg.BREAKER_FAILURES, breaker_reset_timeout=cfg.BREAKER_RESET_TIMEOUT, backoff_base=cfg.BACKOFF_BASE, backoff_cap=cfg.BACKOFF_CAP, pool_maxsize=cfg.POOL_MAXSIZE, dns_cache_ttl=cfg.DNS_CACHE_TTL, provider_workers=cfg.PROVIDER_WORKERS, scan_queue_size=cfg.SCAN_QUEUE_SIZE, verbose=cfg.VERBOSE, log_level=cfg.LOG_LEVEL, file_log=cfg.FILE_LOG, file_log_folder=cfg.FILE_LOG_FOLDER, use_proxy=cfg.USE_PROXY, cluster_node=cfg.CLUSTER_NODE, cluster_nodes=cfg.CLUSTER_NODES, cluster_lease_folder=cfg.CLUSTER_LEASE_FOLDER, cluster_lease_ttl=cfg.CLUSTER_LEASE_TTL, cluster_steal_limit=cfg.CLUSTER_STEAL_LIMIT)
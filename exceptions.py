@@ -33,3 +33,12 @@ class SubtitlesNotFoundException(Exception):
 
 class UnknownResultException(Exception):
     pass
+
+
+class CircuitOpenException(Exception):
+    def __init__(self, name):
+        super().__init__(f'Circuit open for {name}, skipping request')
+
+
+class InvalidSubtitleException(Exception):
+    pass
@@ -1,48 +1,57 @@
 import os
 import re
 import struct
+from collections import Counter
 from datetime import datetime
 from datetime import timedelta
 from exceptions import SizeTooSmallException
 
-from babelfish import Language
-from enzyme import MKV
-
 
 class GetFiles:
+    PATTERN = re.compile(r'.*\.(mkv|mp4|avi)$', re.IGNORECASE)
+
     def __init__(self, search_folder, language, age, embedded, logger):
         self.search_folder = search_folder
-        self.language = language
+        self.languages = [language] if isinstance(language, str) else list(language)
         self.age = age
         self.embedded = embedded
         self.logger = logger
         self._qualified_files = []
+        self._missing_languages = {}
+        self.stats = Counter()
 
-    def verify_file(self, root, filename, pattern, language):
+    def verify_file(self, root, filename, pattern, languages):
         full_filename = os.path.join(root, filename)
 
         if filename.startswith('.'):
-            self.logger.info(f'Skipping hidden file {filename}')
-            return False
+            self.stats['hidden'] += 1
+            self.logger.debug('Skipping hidden file {}', filename)
+            return []
         elif os.path.islink(full_filename):
-            self.logger.info(f'Skipping link file {full_filename}')
-            return False
+            self.stats['link'] += 1
+            self.logger.debug('Skipping link file {}', full_filename)
+            return []
         elif not pattern.match(filename):
-            return False
+            return []
         elif self.age is not None and (datetime.utcnow() - datetime.utcfromtimestamp(os.path.getmtime(full_filename)) > timedelta(days=self.age)):
             # Skipping old file without logging
-            return False
+            self.stats['old'] += 1
+            return []
         else:
-            subtitle_filename = full_filename[:-3] + str(language) + ".srt"
-            subtitle_file_exists = os.path.exists(subtitle_filename)
+            missing_languages = []
+            for code in languages:
+                subtitle_filename = full_filename[:-3] + code + ".srt"
+                if not os.path.exists(subtitle_filename):
+                    missing_languages.append(code)
 
-            if subtitle_file_exists:
-                self.logger.info(f'Skipping externally subtitled file {full_filename}')
-                return False
-            else:
-                return True
+            if not missing_languages:
+                self.stats['subtitled'] += 1
+                self.logger.debug('Skipping externally subtitled file {}', full_filename)
+            return missing_languages
 
     def verify_embedded(self, tracks, language):
+        from babelfish import Language
+
         track_match = False
         if tracks:
             for track in tracks:
@@ -64,43 +73,81 @@ class GetFiles:
                         continue
         return track_match
 
-    @property
-    def qualified_files(self):
-        if self._qualified_files:
-            return self._qualified_files
+    def verify_path(self, root, filename, pattern, languages):
+        missing_languages = self.verify_file(root, filename, pattern, languages)
+        if not missing_languages:
+            return []
 
-        pattern = re.compile(r'.*\.(mkv|mp4|avi)$', re.IGNORECASE)
-        language = Language(self.language)
+        full_filename = os.path.join(root, filename)
+
+        if self.embedded and os.path.splitext(filename)[1].lower() == '.mkv':
+            # Imported once a file needs it so startup does not pay for them (babelfish pulls in pkg_resources),
+            # and outside the try so a broken install is not hidden
+            import babelfish  # noqa: F401
+            from enzyme import MKV
+
+            try:
+                with open(full_filename, 'rb') as f:
+                    # Probe once and check every missing language against the same tracks
+                    mkv = MKV(f)
+                    if mkv is not None:
+                        for code in list(missing_languages):
+                            embedded_match = False
+                            if mkv.audio_tracks and len(mkv.audio_tracks) == 1:
+                                embedded_match = self.verify_embedded(mkv.audio_tracks, code)
+                            if not embedded_match:
+                                embedded_match = self.verify_embedded(mkv.subtitle_tracks, code)
+                                if embedded_match: self.logger.debug('Internal {} subtitle found for {}', code, full_filename)
+                            else:
+                                self.logger.debug('Internal {} audio found for {}', code, full_filename)
+                            if embedded_match:
+                                missing_languages.remove(code)
+            except:
+                pass
+
+        if not missing_languages:
+            self.stats['embedded'] += 1
+        return missing_languages
+
+    def verify_video(self, video_path):
+        # Single file check, used for files reported from outside instead of found by the scan
+        root, filename = os.path.split(os.path.abspath(video_path))
+        if not os.path.isfile(video_path):
+            return []
+        return self.verify_path(root, filename, self.PATTERN, self.languages)
+
+    def iter_qualified(self):
+        # Yields (video path, missing languages) as soon as each file is verified
+        qualified = 0
 
         for root, dirnames, filenames in os.walk(self.search_folder, topdown=True):
             dirnames[:] = [d for d in dirnames if d != "Plex Versions" and not d.startswith('.')]
-            for filename in (filename for filename in filenames if self.verify_file(root, filename, pattern, language)):
-                full_filename = os.path.join(root, filename)
+            for filename in filenames:
+                missing_languages = self.verify_path(root, filename, self.PATTERN, self.languages)
+                if missing_languages:
+                    qualified += 1
+                    yield os.path.join(root, filename), missing_languages
 
-                embedded_match = False
-                if self.embedded:
-                    try:
-                        extension = os.path.splitext(filename)[1].lower()
-                        if extension == '.mkv':
-                            with open(full_filename, 'rb') as f:                                
-                                mkv = MKV(f)
-                                if mkv is not None:
-                                    if mkv.audio_tracks and len(mkv.audio_tracks) == 1:
-                                        embedded_match = self.verify_embedded(mkv.audio_tracks, language)
-                                    if not embedded_match:
-                                        embedded_match = self.verify_embedded(mkv.subtitle_tracks, language)
-                                        if embedded_match: self.logger.info(f'Internal subtitle found for {full_filename}')    
-                                    else:
-                                        self.logger.info(f'Internal audio found for {full_filename}')
-                    except:
-                        pass
-                    
-                if not embedded_match:
-                    self._qualified_files.append(full_filename)
+        self.logger.info('Skipped {} hidden, {} link, {} old, {} externally subtitled and {} embedded file(s)',
+                         self.stats['hidden'], self.stats['link'], self.stats['old'], self.stats['subtitled'], self.stats['embedded'])
+        if qualified: self.logger.info(f'{qualified} file(s) to be processed')
+
+    @property
+    def qualified_files(self):
+        if self._qualified_files:
+            return self._qualified_files
+
+        for full_filename, missing_languages in self.iter_qualified():
+            self._qualified_files.append(full_filename)
+            self._missing_languages[full_filename] = missing_languages
 
-        if self._qualified_files: self.logger.info(f'{len(self._qualified_files)} file(s) to be processed')
         return self._qualified_files
 
+    @property
+    def missing_languages(self):
+        self.qualified_files
+        return self._missing_languages
+
 class FileInfo:
     LITTLE_ENDIAN_LONG_LONG = '<q'
     BYTE_SIZE = struct.calcsize(LITTLE_ENDIAN_LONG_LONG)
@@ -0,0 +1,47 @@
+import os
+import sys
+
+import logbook
+from logbook.queues import ThreadedWrapperHandler
+
+# All component loggers share the group level, so suppressed calls return
+# before their message is formatted
+loggers = logbook.LoggerGroup()
+
+
+def get_logger(name):
+	logger = logbook.Logger(name)
+	loggers.add_logger(logger)
+	return logger
+
+
+class LogPipeline:
+	def __init__(self, level='INFO', verbose=False, file_log=True, file_log_folder='logs'):
+		self.level = logbook.lookup_level(level)
+		self.verbose = verbose
+		self.file_log = file_log
+		self.file_log_folder = file_log_folder
+		self.handlers = []
+		self.setup = None
+
+	def __enter__(self):
+		loggers.level = self.level
+
+		# Records are queued and written by a background thread per output
+		self.handlers = []
+		if self.verbose:
+			self.handlers.append(ThreadedWrapperHandler(logbook.StreamHandler(sys.stdout, level=self.level, bubble=True)))
+		if self.file_log:
+			log_file = os.path.join(self.file_log_folder, 'subtitles.log')
+			self.handlers.append(ThreadedWrapperHandler(logbook.TimedRotatingFileHandler(log_file, date_format='%Y-%m-%d', level=self.level, bubble=True)))
+
+		self.setup = logbook.NestedSetup([logbook.NullHandler()] + self.handlers)
+		self.setup.push_application()
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.setup.pop_application()
+		for handler in self.handlers:
+			# Waits for the writer thread to drain its queue
+			handler.close()
+		self.handlers = []
@@ -0,0 +1,155 @@
+import codecs
+import os
+import re
+from exceptions import InvalidSubtitleException
+
+SAMPLE_SIZE = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+MAX_LINE_LENGTH = 4096
+
+# Bytes with no character in Windows-1252, only possible in ISO-8859-1
+LATIN1_ONLY_BYTES = frozenset(b'\x81\x8d\x8f\x90\x9d')
+
+
+def detect_encoding(sample):
+	if sample.startswith(codecs.BOM_UTF8):
+		return 'utf-8-sig'
+	if sample.startswith(codecs.BOM_UTF16_LE) or sample.startswith(codecs.BOM_UTF16_BE):
+		return 'utf-16'
+
+	try:
+		# Not final, the sample may end in the middle of a character
+		codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+		return 'utf-8'
+	except UnicodeDecodeError:
+		pass
+
+	return detect_legacy_encoding(sample)
+
+
+def detect_legacy_encoding(data):
+	if LATIN1_ONLY_BYTES.intersection(data):
+		return 'iso-8859-1'
+	return 'cp1252'
+
+
+class SrtValidator:
+	TIMING = re.compile(r'^\d+:\d{2}:\d{2}[,.]\d{1,3}\s*-->\s*\d+:\d{2}:\d{2}[,.]\d{1,3}')
+
+	def __init__(self):
+		self.state = 'index'
+		self.cues = 0
+		self.errors = 0
+
+	def feed(self, line):
+		line = line.strip()
+
+		if self.state == 'index':
+			if not line:
+				return
+			if line.isdigit():
+				self.state = 'timing'
+			elif self.TIMING.match(line):
+				# Cue without its number, still playable
+				self.cues += 1
+				self.state = 'text'
+			else:
+				self.errors += 1
+		elif self.state == 'timing':
+			if self.TIMING.match(line):
+				self.cues += 1
+				self.state = 'text'
+			else:
+				self.errors += 1
+				self.state = 'index'
+		elif not line:
+			self.state = 'index'
+
+
+class SubtitleNormalizer:
+	def __init__(self, chunk_size=CHUNK_SIZE, sample_size=SAMPLE_SIZE):
+		self.chunk_size = chunk_size
+		self.sample_size = sample_size
+		self.encoding = None
+		self.decoder = None
+		self.validator = None
+
+	def decode(self, data, final=False):
+		try:
+			return self.decoder.decode(data, final)
+		except UnicodeDecodeError as ex:
+			# Only UTF-8 decodes strictly: the sample was plain ASCII and a legacy byte showed up later.
+			# What came before the bad byte is valid in both, so carry on with the legacy encoding.
+			head, tail = ex.object[:ex.start], ex.object[ex.start:]
+			self.encoding = detect_legacy_encoding(tail)
+			self.decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+			return head.decode('utf-8') + self.decoder.decode(tail, final)
+
+	def lines(self, source):
+		# Decoded text with '\n' line endings, chunk by chunk
+		sample = source.read(self.sample_size)
+		self.encoding = detect_encoding(sample)
+		# A UTF-8 guess is only as good as the sample, later chunks may prove it wrong
+		errors = 'strict' if self.encoding == 'utf-8' else 'replace'
+		self.decoder = codecs.getincrementaldecoder(self.encoding)(errors=errors)
+
+		pending = ''
+		chunk = sample
+		first = True
+		while chunk:
+			text = pending + self.decode(chunk)
+			if first:
+				text = text.lstrip('\ufeff')
+				first = False
+
+			# Keep a trailing '\r' until we know whether a '\n' follows
+			if text.endswith('\r'):
+				text, pending = text[:-1], '\r'
+			else:
+				pending = ''
+
+			yield text.replace('\r\n', '\n').replace('\r', '\n')
+			chunk = source.read(self.chunk_size)
+
+		yield (pending + self.decode(b'', final=True)).replace('\r', '\n')
+
+	def normalize(self, source, destination):
+		self.validator = SrtValidator()
+		partial_line = ''
+		for text in self.lines(source):
+			if not text:
+				continue
+			destination.write(text.encode('utf-8'))
+
+			lines = (partial_line + text).split('\n')
+			# Only the start of a line matters for validation, so a line without end cannot grow memory
+			partial_line = lines.pop()[:MAX_LINE_LENGTH]
+			for line in lines:
+				self.validator.feed(line)
+
+		if partial_line:
+			self.validator.feed(partial_line)
+
+		return self.validator
+
+
+def write_subtitle(source, subtitle_filename, chunk_size=CHUNK_SIZE):
+	# Written next to the target and moved into place only when it looks like a subtitle
+	normalizer = SubtitleNormalizer(chunk_size=chunk_size)
+	temp_filename = subtitle_filename + '.tmp'
+	try:
+		with open(temp_filename, 'wb') as f:
+			validator = normalizer.normalize(source, f)
+
+		if not validator.cues:
+			raise InvalidSubtitleException(f'No subtitle cues found ({normalizer.encoding})')
+		if validator.errors > validator.cues:
+			# A page or document that happens to contain a few timings
+			raise InvalidSubtitleException(f'Too many malformed lines ({validator.errors} for {validator.cues} cues)')
+
+		os.replace(temp_filename, subtitle_filename)
+	finally:
+		if os.path.exists(temp_filename):
+			os.remove(temp_filename)
+
+	return normalizer
@@ -1,7 +1,8 @@
 import os
 import random
-from exceptions import (LoginException, LogoutException, NotLoggedInException,
-						SizeTooSmallException, SubtitlesNotFoundException,
+import time
+from exceptions import (CircuitOpenException, LoginException, LogoutException,
+						NotLoggedInException, SizeTooSmallException, SubtitlesNotFoundException,
 						TooManyTriesException, UnknownResultException)
 from xml.etree import ElementTree
 
@@ -9,6 +10,8 @@ import requests
 from guessit import guessit
 
 from files import FileInfo
+from resilience import backoff, get_breaker
+from transport import get_transport
 from subtitles import BSPlayerSubtitle, BSPlayerSubtitleResults
 
 
@@ -31,8 +34,7 @@ class BSPlayer:
 
 	HEADERS = {
 		'User-Agent': 'BSPlayer/2.x (1022.12362)',
-		'Content-Type': 'text/xml; charset=utf-8',
-		'Connection': 'close'
+		'Content-Type': 'text/xml; charset=utf-8'
 	}
 
 	DATA_FORMAT = ('<?xml version="1.0" encoding="UTF-8"?>\n'
@@ -46,26 +48,52 @@ class BSPlayer:
 
 	APP_ID = 'BSPlayer v2.67'
 
+	HANDLE_VALID_STATUSES = ('OK', 'Not found')
+
+	@classmethod
+	def get_breaker(cls, search_url):
+		return get_breaker(f'BSPlayer {search_url}')
+
 	@classmethod
 	def get_sub_domain(cls):
-		sub_domain = random.choice(cls.SUB_DOMAINS)
-		return cls.API_URL_TEMPLATE.format(sub_domain=sub_domain)
+		# Prefer mirrors that have not been failing
+		search_urls = [cls.API_URL_TEMPLATE.format(sub_domain=sub_domain) for sub_domain in cls.SUB_DOMAINS]
+		available_urls = [search_url for search_url in search_urls if not cls.get_breaker(search_url).is_open()]
+		return random.choice(available_urls or search_urls)
 
-	def __init__(self, logger, proxy_pool, timeout=None, tries=5):
+	def __init__(self, logger, proxy_pool, timeout=None, tries=5, session=None, transport=None):
 		self.logger = logger
-		self.logger.name = "BSPlayer"
 		self.search_url = self.get_sub_domain()
 		self.token = None
 		self.proxy = None
 		self.proxy_pool = proxy_pool
 		self.timeout = timeout
 		self.tries = tries
+		self.session = session
+		self.transport = transport or get_transport()
+		self._file_info = None
+		self._video_info = None
+		# True while the token comes from a saved session that has not answered yet
+		self._reused = False
+		# True once the token is on disk for the next run, only then is the logout skipped
+		self._persisted = False
 
 	def __enter__(self):
-		self.login()
+		if self.session is not None and self.session.load() and (self.session.proxy is None) == (self.proxy_pool is None):
+			self.token = self.session.token
+			self.search_url = self.session.search_url
+			self.proxy = self.session.proxy
+			self._reused = True
+			self._persisted = True
+			self.logger.info('Reusing previous session')
+		else:
+			self.login()
 		return self
 
 	def __exit__(self, exc_type, exc_val, exc_tb):
+		if self._persisted:
+			# Keep the session alive for the next run
+			return
 		return self.logout()
 
 	def api_request(self, func_name, params=''):
@@ -75,23 +103,31 @@ class BSPlayer:
 
 		data = self.DATA_FORMAT.format(search_url=self.search_url, func_name=func_name, params=params)
 		
-		self.logger.info(f'Sending request: {func_name}')
-		
-		proxies = None
-		if self.proxy != None:
-			proxies = {"https": self.proxy}
+		self.logger.debug('Sending request: {}', func_name)
 		
+		breaker = self.get_breaker(self.search_url)
 		for i in range(self.tries):
+			# Fails fast with CircuitOpenException while the mirror is down
+			breaker.before_call()
 			try:
-				self.logger.info(f'Try number {i+1} for operation {func_name}')
-				res = requests.post(self.search_url, data=data, headers=headers, timeout=self.timeout, proxies=proxies)
-				return ElementTree.fromstring(res.content)
+				self.logger.debug('Try number {} for operation {}', i + 1, func_name)
+				res = self.transport.post(self.search_url, data=data, headers=headers, timeout=self.timeout, proxy=self.proxy)
+				root = ElementTree.fromstring(res.content)
 			except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, TimeoutError, ConnectionError):
+				breaker.failure()
 				if func_name == "logIn" and self.proxy_pool != None:
 					self.proxy = next(self.proxy_pool)
-					proxies = {"https": self.proxy}
 					self.logger.info(f'Requests with proxy {self.proxy}')
+				if i + 1 < self.tries:
+					time.sleep(backoff(i))
 				continue
+			except BaseException:
+				# Error pages that are not XML and other request errors must still settle the breaker
+				breaker.failure()
+				raise
+
+			breaker.success()
+			return root
 
 		self.logger.error(f'Too many tries {self.tries}')
 		raise TooManyTriesException(func_name)
@@ -100,6 +136,9 @@ class BSPlayer:
 		if self.token:
 			self.logger.info('Already logged in')
 			return
+
+		if self.get_breaker(self.search_url).is_open():
+			self.search_url = self.get_sub_domain()
 			
 		if self.proxy_pool != None:
 			self.proxy = next(self.proxy_pool)
@@ -113,6 +152,13 @@ class BSPlayer:
 		if res.find('status').text == 'OK':
 			self.token = res.find('data').text
 			self.logger.info('Logged in successfully')
+			if self.session is not None:
+				try:
+					self.session.save(self.token, self.search_url, self.proxy)
+					self._persisted = True
+				except OSError:
+					# Not being able to persist the session only costs a login next run
+					self.logger.exception('Error saving session')
 			return
 
 		self.logger.error('Error logging in')
@@ -134,15 +180,57 @@ class BSPlayer:
 		self.logger.error('Error logging out')
 		raise LogoutException()
 
+	def relogin(self, switch_mirror=False):
+		self.token = None
+		self.proxy = None
+		self._reused = False
+		self._persisted = False
+		if self.session is not None:
+			self.session.clear()
+		if switch_mirror:
+			self.search_url = self.get_sub_domain()
+		self.login()
+
+	@BSPlayerDecorators.requires_login
+	def handle_request(self, func_name, params=''):
+		try:
+			root = self.api_request(func_name=func_name, params=f'<handle>{self.token}</handle>{params}')
+		except (TooManyTriesException, CircuitOpenException):
+			if not self._reused:
+				raise
+			# The saved mirror or proxy may be gone, start over with fresh ones
+			self.logger.info('Saved session is unreachable, logging in again')
+			self.relogin(switch_mirror=True)
+			return self.api_request(func_name=func_name, params=f'<handle>{self.token}</handle>{params}')
+
+		self._reused = False
+		if self.session is not None:
+			status = root.find('.//return//status')
+			if status is not None and status.text not in self.HANDLE_VALID_STATUSES:
+				self.logger.info(f'Session handle rejected ({status.text}), logging in again')
+				self.relogin()
+				root = self.api_request(func_name=func_name, params=f'<handle>{self.token}</handle>{params}')
+		return root
+
+	def get_file_info(self, video_path):
+		# Cached so every language searched for the same file reuses its hash
+		if self._file_info is None or self._file_info.path != video_path:
+			self._file_info = FileInfo(video_path)
+		return self._file_info
+
+	def get_video_info(self, video_path):
+		if self._video_info is None or self._video_info[0] != video_path:
+			self._video_info = (video_path, guessit(video_path))
+		return self._video_info[1]
+
 	@BSPlayerDecorators.requires_login
 	def search_subtitles(self, video_path, language):
 		try:
-			file_info = FileInfo(video_path)
+			file_info = self.get_file_info(video_path)
 
 			self.logger.info(
-				f'Searching subtitles for {video_path} (size={file_info.size} hash={file_info.hash})')
-			root = self.api_request(func_name='searchSubtitles', params=(
-				f'<handle>{self.token}</handle>'
+				f'Searching {language} subtitles for {video_path} (size={file_info.size} hash={file_info.hash})')
+			root = self.handle_request(func_name='searchSubtitles', params=(
 				f'<movieHash>{file_info.hash}</movieHash>'
 				f'<languageId>{language}</languageId>'
 				f'<imdbId>*</imdbId>'
@@ -152,7 +240,7 @@ class BSPlayer:
 			if res.find('status').text == 'Not found':
 				raise SubtitlesNotFoundException(video_path)
 			elif res.find('status').text != 'OK':
-				raise UnknownResultError()
+				raise UnknownResultException()
 
 			items = root.findall('.//return/data/item')
 			subtitles = []
@@ -174,6 +262,6 @@ class BSPlayer:
 	@BSPlayerDecorators.requires_login
 	def download_by_path(self, video_path, language):
 		subtitles = self.search_subtitles(video_path, language)
-		video_info = guessit(video_path)
-		self.logger.info(f'Downloading subtitle for {video_path}')
-		return subtitles.get_qualified(video_info).download(self.timeout, self.proxy, video_path, language)
+		video_info = self.get_video_info(video_path)
+		self.logger.info(f'Downloading {language} subtitle for {video_path}')
+		return subtitles.get_qualified(video_info).download(self.transport, self.timeout, self.proxy, video_path, language)
@@ -1,37 +1,45 @@
 import os
 import time
-from exceptions import (ParseResponseException, ServiceUnavailableException,
-						SubtitlesNotFoundException)
+from concurrent.futures import ThreadPoolExecutor
+from exceptions import (CircuitOpenException, ParseResponseException,
+						ServiceUnavailableException, SubtitlesNotFoundException)
 from parser import ParserBeautifulSoup
 
-from requests import Session
 from guessit import guessit
 
+from resilience import RetrySession, get_breaker
 from subtitles import SubdivxSubtitle, SubdivxSubtitleResults
+from transport import get_transport
 
 
 class Subdivx:
 	BASE_URL = "https://www.subdivx.com/"
+	LANGUAGE = 'spa'
 
-	def __init__(self, logger, proxy_pool, timeout=60):
+	def __init__(self, logger, proxy_pool, timeout=60, prefetch=3, tries=3, transport=None):
 		self.session = None
+		self.executor = None
 		self.logger = logger
-		self.logger.name = "subdivx"
 		self.proxy = None
 		self.proxy_pool = proxy_pool
 		self.timeout = timeout
 		self.multi_result_throttle = 2
+		self.prefetch = max(1, prefetch)
+		self.tries = tries
+		self.transport = transport or get_transport()
 
 	def __enter__(self):
-		self.session = Session()
-		self.session.headers['User-Agent'] = 'SubtitlesDownloader/2.x'
+		self.session = RetrySession(self.transport, get_breaker(f'Subdivx {self.BASE_URL}'), tries=self.tries,
+									headers={'User-Agent': 'SubtitlesDownloader/2.x'}, logger=self.logger)
+		self.executor = ThreadPoolExecutor(max_workers=self.prefetch)
 		if self.proxy_pool != None:
 			self.proxy = next(self.proxy_pool)
 			self.logger.info(f'Requests with proxy {self.proxy}')
 		return self
 
 	def __exit__(self, exc_type, exc_val, exc_tb):
-		self.session.close()
+		# The transport is shared, its connections are kept for the next provider
+		self.executor.shutdown(wait=True)
 		return
 
 	def query(self, keyword, season=None, episode=None, year=None):
@@ -51,12 +59,8 @@ class Subdivx:
 		subtitles = []
 		search_link = self.BASE_URL + 'index.php'
 		
-		proxies = None
-		if self.proxy != None:
-			proxies = {"https": self.proxy}
-		
 		while True:
-			response = self.session.get(search_link, params=params, timeout=self.timeout, proxies=proxies)
+			response = self.session.get(search_link, params=params, timeout=self.timeout, proxy=self.proxy)
 			if response.status_code != 200:
 				raise ServiceUnavailableException('Bad status code: ' + str(response.status_code))
 
@@ -118,7 +122,30 @@ class Subdivx:
 	def download_by_path(self, video_path):
 		video_info = guessit(video_path)
 		subtitles = self.search_subtitles(video_path, video_info)
-		subtitle = subtitles.get_qualified(video_info)
-		self.logger.info('Subtitle found')
+		candidates = subtitles.get_ranked(video_info)[:self.prefetch]
+		if not candidates:
+			raise SubtitlesNotFoundException(video_path)
+
+		self.logger.info(f'{len(candidates)} subtitle candidate(s) found')
 		self.logger.info(f'Downloading subtitle for {video_path}')
-		return subtitle.download(self.session, self.timeout, self.proxy, video_path, video_info)
+
+		# Fetch the top candidates concurrently and fall through to the next one when an archive is not usable
+		futures = [self.executor.submit(candidate.fetch_archive, self.session, self.timeout, self.proxy) for candidate in candidates]
+		error = None
+		try:
+			for candidate, future in zip(candidates, futures):
+				try:
+					archive = future.result()
+					return candidate.save(archive, video_path, video_info)
+				except Exception as ex:
+					# Request errors, broken archives or bad subtitles only rule out this candidate
+					error = ex
+					self.logger.warning(f'{type(ex).__name__}: {ex} for candidate {candidate.page_link}')
+		finally:
+			for future in futures:
+				future.cancel()
+
+		if isinstance(error, CircuitOpenException):
+			# The site went down while fetching, let the chain back off from the provider
+			raise error
+		raise SubtitlesNotFoundException(video_path)
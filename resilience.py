@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+from exceptions import CircuitOpenException
+
+# Defaults for every breaker, set once per run from the config
+settings = {'failure_threshold': 5, 'reset_timeout': 300, 'backoff_base': 1.0, 'backoff_cap': 30.0}
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def configure(failure_threshold=5, reset_timeout=300, backoff_base=1.0, backoff_cap=30.0):
+	settings.update(failure_threshold=failure_threshold, reset_timeout=reset_timeout, backoff_base=backoff_base, backoff_cap=backoff_cap)
+	with _breakers_lock:
+		# Breakers outlive a run in the service and the server, keep them in line with the config
+		for breaker in _breakers.values():
+			breaker.failure_threshold = failure_threshold
+			breaker.reset_timeout = reset_timeout
+
+
+def backoff(attempt):
+	# Full jitter, so clients retrying together spread out
+	return random.uniform(0, min(settings['backoff_cap'], settings['backoff_base'] * 2 ** attempt))
+
+
+def get_breaker(name):
+	with _breakers_lock:
+		if name not in _breakers:
+			_breakers[name] = CircuitBreaker(name, settings['failure_threshold'], settings['reset_timeout'])
+		return _breakers[name]
+
+
+class CircuitBreaker:
+	CLOSED = 'closed'
+	OPEN = 'open'
+	HALF_OPEN = 'half-open'
+
+	def __init__(self, name, failure_threshold=5, reset_timeout=300):
+		self.name = name
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+		self.state = self.CLOSED
+		self.failures = 0
+		self.opened = None
+		self._probing = False
+		self._lock = threading.Lock()
+
+	def is_open(self):
+		# True while calls would be rejected, including while a half-open probe is in flight
+		with self._lock:
+			if self.state == self.HALF_OPEN:
+				return self._probing
+			return self.state == self.OPEN and time.monotonic() - self.opened < self.reset_timeout
+
+	def before_call(self):
+		with self._lock:
+			if self.state == self.OPEN:
+				if time.monotonic() - self.opened < self.reset_timeout:
+					raise CircuitOpenException(self.name)
+				# Let a single request through to check whether the service is back
+				self.state = self.HALF_OPEN
+				self._probing = False
+
+			if self.state == self.HALF_OPEN:
+				if self._probing:
+					raise CircuitOpenException(self.name)
+				self._probing = True
+
+	def success(self):
+		with self._lock:
+			self.state = self.CLOSED
+			self.failures = 0
+			self._probing = False
+
+	def failure(self):
+		with self._lock:
+			self.failures += 1
+			if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+				self.state = self.OPEN
+				self.opened = time.monotonic()
+				self._probing = False
+
+
+class RetrySession:
+	def __init__(self, session, breaker, tries=3, headers=None, logger=None):
+		self.session = session
+		self.breaker = breaker
+		self.tries = tries
+		self.headers = headers or {}
+		self.logger = logger
+
+	def __getattr__(self, name):
+		return getattr(self.session, name)
+
+	def get(self, url, **kwargs):
+		import requests
+
+		retry_exceptions = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, TimeoutError, ConnectionError)
+		kwargs['headers'] = dict(self.headers, **kwargs.get('headers', {}))
+		for i in range(self.tries):
+			self.breaker.before_call()
+			try:
+				response = self.session.get(url, **kwargs)
+			except retry_exceptions as ex:
+				error = ex
+			except BaseException:
+				# Any other error must still settle the breaker, or a half-open probe never ends
+				self.breaker.failure()
+				raise
+			else:
+				if response.status_code < 500:
+					self.breaker.success()
+					return response
+				error = None
+
+			self.breaker.failure()
+			if i + 1 < self.tries:
+				delay = backoff(i)
+				if self.logger is not None:
+					self.logger.debug('Try number {} for {} failed, retrying in {:.1f}s', i + 1, url, delay)
+				time.sleep(delay)
+
+		if error is not None:
+			raise error
+		return response
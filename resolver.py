@@ -0,0 +1,104 @@
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+
+class DNSCache:
+	def __init__(self, ttl=300, maxsize=256):
+		self.ttl = ttl
+		self.maxsize = maxsize
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+
+	def resolve(self, host, port):
+		# Addresses for host, oldest entries are dropped first once full
+		key = (host, port)
+		now = time.monotonic()
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None and entry[0] > now:
+				self._entries.move_to_end(key)
+				return entry[1]
+
+		try:
+			infos = socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM)
+		except OSError:
+			# Let the connection report the resolution error as usual
+			return None
+
+		addresses = list(OrderedDict.fromkeys(info[4][0] for info in infos))
+		with self._lock:
+			self._entries[key] = (now + self.ttl, addresses)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.maxsize:
+				self._entries.popitem(last=False)
+		return addresses
+
+	def forget(self, host, port):
+		with self._lock:
+			self._entries.pop((host, port), None)
+
+	def __len__(self):
+		return len(self._entries)
+
+
+class CachedResolutionMixin:
+	dns_cache = None
+
+	def _new_conn(self):
+		host = self._dns_host
+		addresses = self.dns_cache.resolve(host, self.port)
+		if not addresses:
+			return super()._new_conn()
+
+		# Connect by address, TLS still checks the certificate against self.host
+		error = None
+		try:
+			for address in addresses:
+				self._dns_host = address
+				try:
+					return super()._new_conn()
+				except (NewConnectionError, ConnectTimeoutError) as ex:
+					error = ex
+		finally:
+			self._dns_host = host
+
+		# The host may have moved, resolve it again next time
+		self.dns_cache.forget(host, self.port)
+		raise error
+
+
+def pool_classes(dns_cache):
+	# Classes bound to one cache, so only the transport that owns it resolves through it
+	http_connection = type('CachedHTTPConnection', (CachedResolutionMixin, HTTPConnection), {'dns_cache': dns_cache})
+	https_connection = type('CachedHTTPSConnection', (CachedResolutionMixin, HTTPSConnection), {'dns_cache': dns_cache})
+	return {
+		'http': type('CachedHTTPConnectionPool', (HTTPConnectionPool,), {'ConnectionCls': http_connection}),
+		'https': type('CachedHTTPSConnectionPool', (HTTPSConnectionPool,), {'ConnectionCls': https_connection}),
+	}
+
+
+class CachedResolutionAdapter(HTTPAdapter):
+	def __init__(self, dns_cache, **kwargs):
+		# Set before the base class builds its pool manager
+		self.dns_cache = dns_cache
+		self.pool_classes_by_scheme = pool_classes(dns_cache)
+		super().__init__(**kwargs)
+
+	def init_poolmanager(self, *args, **kwargs):
+		super().init_poolmanager(*args, **kwargs)
+		self.poolmanager.pool_classes_by_scheme = self.pool_classes_by_scheme
+
+	def proxy_manager_for(self, proxy, **proxy_kwargs):
+		manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+		if not proxy.lower().startswith('socks'):
+			# SOCKS managers bring their own connection classes
+			manager.pool_classes_by_scheme = self.pool_classes_by_scheme
+		return manager
@@ -0,0 +1,207 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from itertools import count, cycle
+from socketserver import ThreadingMixIn
+
+import config as cfg
+from download import get_proxies
+from files import GetFiles
+from log import LogPipeline, get_logger
+from resilience import configure as configure_resilience
+from session import BSPlayerSession
+from stats import ProviderStats
+from transport import configure as configure_transport
+from transport import get_active_transport
+
+logger = get_logger('Server')
+
+
+class Job:
+	def __init__(self, video_path, priority):
+		self.id = uuid.uuid4().hex
+		self.video_path = video_path
+		self.priority = priority
+		self.status = 'queued'
+		self.languages = []
+		self.created = time.time()
+		self.finished = None
+
+	def to_dict(self):
+		return {'id': self.id, 'path': self.video_path, 'priority': self.priority, 'status': self.status,
+				'pending_languages': self.languages, 'created': self.created, 'finished': self.finished}
+
+
+class JobWorker(threading.Thread):
+	def __init__(self, files, open_chain, idle_timeout=300, max_jobs=1000):
+		super().__init__(daemon=True)
+		self.files = files
+		self.open_chain = open_chain
+		self.idle_timeout = idle_timeout
+		self.max_jobs = max_jobs
+		self.jobs = OrderedDict()
+		self.jobs_lock = threading.Lock()
+		self.queue = queue.PriorityQueue()
+		self.sequence = count()
+		self.chain = None
+		self.stopped = threading.Event()
+
+	def submit(self, video_path, priority=0):
+		job = Job(video_path, priority)
+		with self.jobs_lock:
+			self.jobs[job.id] = job
+			while len(self.jobs) > self.max_jobs:
+				self.jobs.popitem(last=False)
+		# Lower values go first, the sequence keeps FIFO order within a priority
+		self.queue.put((priority, next(self.sequence), job))
+		return job
+
+	def get_job(self, job_id):
+		with self.jobs_lock:
+			return self.jobs.get(job_id)
+
+	def stop(self):
+		self.stopped.set()
+		self.queue.put((float('-inf'), next(self.sequence), None))
+
+	def run(self):
+		while not self.stopped.is_set():
+			try:
+				priority, sequence, job = self.queue.get(timeout=self.idle_timeout)
+			except queue.Empty:
+				# Let the provider sessions go while there is nothing to do
+				if self.chain is not None:
+					logger.info('Idle, closing provider sessions')
+					self.chain.close()
+					self.chain = None
+				continue
+
+			if job is None:
+				break
+
+			try:
+				job.status = 'running'
+				job.languages = self.files.verify_video(job.video_path)
+				if not job.languages:
+					job.status = 'skipped'
+					continue
+
+				if self.chain is None:
+					self.chain = self.open_chain()
+
+				job.status = 'done' if self.chain.process(job.video_path, job.languages) else 'failed'
+			except:
+				logger.exception(f'Error processing {job.video_path}')
+				job.status = 'failed'
+			finally:
+				job.finished = time.time()
+				logger.info(f'Job {job.id} {job.status} for {job.video_path}')
+
+		if self.chain is not None:
+			self.chain.close()
+			self.chain = None
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+	def send_json(self, status, data):
+		body = json.dumps(data).encode('utf-8')
+		self.send_response(status)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def do_POST(self):
+		if self.path.rstrip('/') != '/jobs':
+			return self.send_json(404, {'error': 'Not found'})
+
+		try:
+			length = int(self.headers.get('Content-Length', 0))
+			data = json.loads(self.rfile.read(length).decode('utf-8'))
+			paths = data['paths'] if 'paths' in data else [data['path']]
+			priority = int(data.get('priority', 0))
+		except (ValueError, KeyError, TypeError, AttributeError, OverflowError):
+			paths = None
+
+		# Checked before anything is queued, a string would otherwise be taken one character at a time
+		if not isinstance(paths, list) or not paths or not all(isinstance(path, str) and path for path in paths):
+			return self.send_json(400, {'error': 'Expected {"paths": ["/path/to/video", ...], "priority": 0}'})
+
+		jobs = [self.server.worker.submit(os.path.abspath(path), priority) for path in paths]
+		self.send_json(202, {'jobs': [job.to_dict() for job in jobs]})
+
+	def do_GET(self):
+		parts = [part for part in self.path.split('/') if part]
+		if parts == ['stats']:
+			transport = get_active_transport()
+			return self.send_json(200, {'transport': transport.stats() if transport is not None else None})
+
+		if len(parts) != 2 or parts[0] != 'jobs':
+			return self.send_json(404, {'error': 'Not found'})
+
+		job = self.server.worker.get_job(parts[1])
+		if job is None:
+			return self.send_json(404, {'error': 'Job not found'})
+		self.send_json(200, job.to_dict())
+
+	def log_message(self, format, *args):
+		logger.debug('{} - {}', self.address_string(), format % args)
+
+
+class JobServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+	def __init__(self, server_address, worker):
+		super().__init__(server_address, JobRequestHandler)
+		self.worker = worker
+
+
+def serve(host="127.0.0.1", port=8088, language="spa", embedded=True, bsplayer_timeout=5, bsplayer_tries=5, bsplayer_session_file=None, bsplayer_session_ttl=None, subdivx_prefetch=3, provider_stats_file=None, breaker_failures=5, breaker_reset_timeout=300, backoff_base=1.0, backoff_cap=30.0, pool_maxsize=10, dns_cache_ttl=300, verbose=False, log_level="INFO", file_log=True, file_log_folder="logs", use_proxy=True, idle_timeout=300):
+	with LogPipeline(level=log_level, verbose=verbose, file_log=file_log, file_log_folder=file_log_folder):
+		configure_resilience(failure_threshold=breaker_failures, reset_timeout=breaker_reset_timeout, backoff_base=backoff_base, backoff_cap=backoff_cap)
+		configure_transport(pool_maxsize=pool_maxsize, dns_ttl=dns_cache_ttl)
+
+		bsplayer_session = None
+		if bsplayer_session_file:
+			bsplayer_session = BSPlayerSession(bsplayer_session_file, ttl=bsplayer_session_ttl)
+
+		provider_stats = None
+		if provider_stats_file:
+			provider_stats = ProviderStats(provider_stats_file)
+
+		# Looked up once on the main thread, every chain reopened after an idle period reuses them
+		proxy_pool = None
+		if use_proxy:
+			logger.info(f'Getting a list of proxies')
+			proxies = set()
+			get_proxies(proxies)
+			proxy_pool = cycle(proxies)
+
+		def open_chain():
+			from chain import ProviderChain
+
+			return ProviderChain(proxy_pool, bsplayer_timeout=bsplayer_timeout, bsplayer_tries=bsplayer_tries, bsplayer_session=bsplayer_session, subdivx_prefetch=subdivx_prefetch, stats=provider_stats)
+
+		files = GetFiles(None, language=language, age=None, embedded=embedded, logger=get_logger('GetFiles'))
+		worker = JobWorker(files, open_chain, idle_timeout=idle_timeout)
+		worker.start()
+
+		server = JobServer((host, port), worker)
+		logger.info(f'Subtitles Server listening on {host}:{port}')
+		try:
+			server.serve_forever()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			server.server_close()
+			worker.stop()
+			worker.join()
+			logger.info(f'Subtitles Server stopped')
+
+if __name__ == '__main__':
+	serve(host=cfg.SERVER_HOST, port=cfg.SERVER_PORT, language=cfg.LANGUAGES, embedded=cfg.EMBEDDED, bsplayer_timeout=cfg.BSPLAYER_TIMEOUT, bsplayer_tries=cfg.BSPLAYER_TRIES, bsplayer_session_file=cfg.BSPLAYER_SESSION_FILE, bsplayer_session_ttl=cfg.BSPLAYER_SESSION_TTL, subdivx_prefetch=cfg.SUBDIVX_PREFETCH, provider_stats_file=cfg.PROVIDER_STATS_FILE, breaker_failures=cfg.BREAKER_FAILURES, breaker_reset_timeout=cfg.BREAKER_RESET_TIMEOUT, backoff_base=cfg.BACKOFF_BASE, backoff_cap=cfg.BACKOFF_CAP, pool_maxsize=cfg.POOL_MAXSIZE, dns_cache_ttl=cfg.DNS_CACHE_TTL, verbose=cfg.VERBOSE, log_level=cfg.LOG_LEVEL, file_log=cfg.FILE_LOG, file_log_folder=cfg.FILE_LOG_FOLDER, use_proxy=cfg.USE_PROXY, idle_timeout=cfg.SERVER_IDLE_TIMEOUT)
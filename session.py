@@ -0,0 +1,66 @@
+import json
+import os
+import threading
+import time
+
+
+class BSPlayerSession:
+	def __init__(self, session_file, ttl=None):
+		self.session_file = session_file
+		self.ttl = ttl
+		self.token = None
+		self.search_url = None
+		self.proxy = None
+		# Provider workers share one session
+		self._lock = threading.Lock()
+
+	def load(self):
+		if not self.session_file or not os.path.exists(self.session_file):
+			return False
+
+		try:
+			with open(self.session_file, 'r') as f:
+				data = json.load(f)
+		except (OSError, ValueError):
+			return False
+
+		created = data.get('created')
+		if self.ttl is not None and (created is None or time.time() - created > self.ttl):
+			return False
+
+		self.token = data.get('token')
+		self.search_url = data.get('search_url')
+		self.proxy = data.get('proxy')
+		return self.token is not None and self.search_url is not None
+
+	def save(self, token, search_url, proxy):
+		with self._lock:
+			self.token = token
+			self.search_url = search_url
+			self.proxy = proxy
+
+			if not self.session_file:
+				return
+
+			data = {'token': token, 'search_url': search_url, 'proxy': proxy, 'created': time.time()}
+			# Unique per process and thread, other processes may share the session file
+			temp_file = f'{self.session_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+			try:
+				with open(temp_file, 'w') as f:
+					json.dump(data, f)
+				os.replace(temp_file, self.session_file)
+			finally:
+				if os.path.exists(temp_file):
+					os.remove(temp_file)
+
+	def clear(self):
+		with self._lock:
+			self.token = None
+			self.search_url = None
+			self.proxy = None
+
+			if self.session_file:
+				try:
+					os.remove(self.session_file)
+				except FileNotFoundError:
+					pass
@@ -0,0 +1,158 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ProviderStats:
+	# Used until a bucket has enough samples of its own
+	DEFAULT_HIT_RATE = 0.5
+	DEFAULT_SECONDS = 5.0
+	# A lock file older than this was left behind by a process that died while saving
+	LOCK_TIMEOUT = 30
+
+	def __init__(self, stats_file, min_samples=20, skip_hit_rate=0.02, explore=0.1, save_every=50):
+		self.stats_file = stats_file
+		self.min_samples = min_samples
+		self.skip_hit_rate = skip_hit_rate
+		self.explore = explore
+		self.save_every = save_every
+		self.stats = {}
+		# Counts recorded since the last save, what this process adds to the file
+		self._unsaved = {}
+		self._unsaved_records = 0
+		self._lock = threading.Lock()
+		self._save_lock = threading.Lock()
+		self.load()
+
+	def read(self):
+		if not self.stats_file or not os.path.exists(self.stats_file):
+			return {}
+
+		try:
+			with open(self.stats_file, 'r') as f:
+				return json.load(f)
+		except (OSError, ValueError):
+			return {}
+
+	def load(self):
+		self.stats = self.read()
+
+	@staticmethod
+	def merge(stats, other):
+		for bucket, bucket_stats in other.items():
+			for provider, provider_stats in bucket_stats.items():
+				merged = stats.setdefault(bucket, {}).setdefault(provider, {'attempts': 0, 'hits': 0, 'seconds': 0.0})
+				for key in ('attempts', 'hits', 'seconds'):
+					merged[key] += provider_stats.get(key, 0)
+		return stats
+
+	@contextmanager
+	def file_lock(self):
+		# Other processes (the batch run, the server) may be saving to the same file
+		lock_file = self.stats_file + '.lock'
+		deadline = time.time() + self.LOCK_TIMEOUT
+		while True:
+			try:
+				os.close(os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+				break
+			except FileExistsError:
+				try:
+					if time.time() - os.path.getmtime(lock_file) > self.LOCK_TIMEOUT:
+						os.remove(lock_file)
+						continue
+				except OSError:
+					continue
+				if time.time() > deadline:
+					raise TimeoutError(f'Provider stats are locked by {lock_file}')
+				time.sleep(0.05)
+
+		try:
+			yield
+		finally:
+			os.remove(lock_file)
+
+	def save(self):
+		if not self.stats_file:
+			return
+
+		with self._save_lock:
+			with self._lock:
+				unsaved, self._unsaved = self._unsaved, {}
+				self._unsaved_records = 0
+
+			try:
+				with self.file_lock():
+					# Only this process' new counts are added, what others saved in the meantime is kept
+					stats = self.merge(self.read(), unsaved)
+					temp_file = f'{self.stats_file}.{os.getpid()}.tmp'
+					with open(temp_file, 'w') as f:
+						json.dump(stats, f)
+					os.replace(temp_file, self.stats_file)
+			except BaseException:
+				with self._lock:
+					self.merge(self._unsaved, unsaved)
+				raise
+
+			with self._lock:
+				# Learn from the other processes too, plus whatever was recorded while writing
+				self.stats = self.merge(stats, self._unsaved)
+
+	@staticmethod
+	def buckets(video_path, video_info):
+		# From the most specific bucket to the global one
+		video_type = video_info.get('type') or 'unknown'
+
+		age_days = (time.time() - os.path.getmtime(video_path)) / 86400
+		if age_days <= 7:
+			age = 'new'
+		elif age_days <= 60:
+			age = 'recent'
+		else:
+			age = 'old'
+
+		release_group = (video_info.get('release_group') or '-').split('[')[0].lower()
+
+		return [f'{video_type}|{age}|{release_group}', f'{video_type}|{age}', video_type, '*']
+
+	def record(self, buckets, provider, hit, seconds):
+		with self._lock:
+			for bucket in buckets:
+				for stats in (self.stats, self._unsaved):
+					provider_stats = stats.setdefault(bucket, {}).setdefault(provider, {'attempts': 0, 'hits': 0, 'seconds': 0.0})
+					provider_stats['attempts'] += 1
+					provider_stats['hits'] += 1 if hit else 0
+					provider_stats['seconds'] += seconds
+			self._unsaved_records += 1
+			due = self.save_every is not None and self._unsaved_records >= self.save_every
+
+		if due:
+			# A crash or a killed service only loses the last few records
+			try:
+				self.save()
+			except OSError:
+				pass
+
+	def estimate(self, buckets, provider):
+		for bucket in buckets:
+			provider_stats = self.stats.get(bucket, {}).get(provider)
+			if provider_stats and provider_stats['attempts'] >= self.min_samples:
+				# Smoothed so a short streak does not drive the rate to 0 or 1
+				hit_rate = (provider_stats['hits'] + 1) / (provider_stats['attempts'] + 2)
+				seconds = provider_stats['seconds'] / provider_stats['attempts']
+				return hit_rate, seconds, True
+
+		return self.DEFAULT_HIT_RATE, self.DEFAULT_SECONDS, False
+
+	def order(self, buckets, providers):
+		ordered = []
+		for provider in providers:
+			hit_rate, seconds, known = self.estimate(buckets, provider)
+			if known and hit_rate < self.skip_hit_rate and random.random() >= self.explore:
+				continue
+			# Expected time spent per subtitle found, cheapest first
+			ordered.append((seconds / hit_rate, provider))
+
+		return [provider for cost, provider in sorted(ordered, key=lambda item: item[0])]
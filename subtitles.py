@@ -5,10 +5,10 @@ import re
 import zipfile
 from exceptions import (ParseResponseException, ServiceUnavailableException,
 						SubtitlesNotFoundException)
+from normalize import write_subtitle
 from parser import ParserBeautifulSoup
 
 import rarfile
-import requests
 from babelfish import Language
 from guessit import guessit
 
@@ -24,17 +24,13 @@ class BSPlayerSubtitle(ElementTreeObject):
 	def validate(self):
 		return self.format == "srt"
 
-	def download(self, timeout, proxy, video_path, language):
-		if timeout is None or video_path is None or language is None:
+	def download(self, transport, timeout, proxy, video_path, language):
+		if transport is None or timeout is None or video_path is None or language is None:
 			raise TypeError("Invalid download parameters")
 
 		headers = {'User-Agent': 'Mozilla/4.0 (compatible; Synapse)', 'Content-Length': '0'}
 
-		proxies = None
-		if proxy != None:
-			proxies = {"https": proxy}
-
-		res = requests.get(self.url, headers=headers, timeout=timeout, proxies=proxies)
+		res = transport.get(self.url, headers=headers, timeout=timeout, proxy=proxy)
 
 		if res.content == '500':
 			raise Exception('Error while downloading subtitles')
@@ -42,8 +38,7 @@ class BSPlayerSubtitle(ElementTreeObject):
 		language = Language(language)
 		subtitle_filename = video_path[:-3] + str(language) + ".srt"
 		with gzip.GzipFile(fileobj=io.BytesIO(res.content)) as gf:
-			with open(subtitle_filename, 'wb') as f:
-				f.write(gf.read())
+			write_subtitle(gf, subtitle_filename)
 
 		return True
 
@@ -57,8 +52,8 @@ class SubdivxSubtitle():
 		if response.status_code != 200:
 			raise ServiceUnavailableException('Bad status code: ' + str(response.status_code))
 
-	def get_download_link(self, session, timeout, proxies):		
-		response = session.get(self.page_link, timeout=timeout, proxies=proxies)
+	def get_download_link(self, session, timeout, proxy):
+		response = session.get(self.page_link, timeout=timeout, proxy=proxy)
 		self.check_response(response)
 
 		try:
@@ -105,36 +100,32 @@ class SubdivxSubtitle():
 				break	
 
 		if result_name:
-			return archive.read(result_name)
+			return archive.open(result_name)
 
 		raise ParseResponseException('Subtitle in the compressed file not found')
 
-	def fix_line_ending(self, content):
-		return content.replace(b'\r\n', b'\n')
-
-	def download(self, session, timeout, proxy, video_path, video_info):
-		if session is None or timeout is None or video_path is None:
-			raise TypeError("Invalid download parameters")
-
-		proxies = None
-		if proxy != None:
-			proxies = {"https": proxy}
-			
-		download_link = self.get_download_link(session, timeout, proxies)
-		response = session.get(download_link, headers={'Referer': self.page_link}, timeout=timeout, proxies=proxies)
+	def fetch_archive(self, session, timeout, proxy):
+		download_link = self.get_download_link(session, timeout, proxy)
+		response = session.get(download_link, headers={'Referer': self.page_link}, timeout=timeout, proxy=proxy)
 		self.check_response(response)
 
-		archive = self.get_archive(response.content)
+		return self.get_archive(response.content)
+
+	def save(self, archive, video_path, video_info):
 		release_group = video_info.get("release_group")
-		subtitle_content = self.get_subtitle_from_archive(archive, release_group)
-		content = self.fix_line_ending(subtitle_content)
-		
 		subtitle_filename = video_path[:-3] + "es.srt"
-		with open(subtitle_filename, 'wb') as f:
-			f.write(content)
+		with self.get_subtitle_from_archive(archive, release_group) as subtitle_stream:
+			write_subtitle(subtitle_stream, subtitle_filename)
 
 		return True
 
+	def download(self, session, timeout, proxy, video_path, video_info):
+		if session is None or timeout is None or video_path is None:
+			raise TypeError("Invalid download parameters")
+
+		archive = self.fetch_archive(session, timeout, proxy)
+		return self.save(archive, video_path, video_info)
+
 class BSPlayerSubtitleResults:
 	def __init__(self, subtitles):
 		self.subtitles = subtitles
@@ -170,8 +161,9 @@ class SubdivxSubtitleResults:
 	def __init__(self, subtitles):
 		self.subtitles = subtitles
 
-	def get_qualified(self, video_info):
-		qualified_subtitle = None
+	def get_ranked(self, video_info):
+		# Subtitles matching the release group, in the site order (most downloaded first)
+		ranked_subtitles = []
 		release_group = video_info.get("release_group")
 		if release_group is not None:
 			current_release_group = release_group.split("[")	
@@ -179,10 +171,13 @@ class SubdivxSubtitleResults:
 				for item in self.subtitles:
 					found = re.search(re.escape(current_release_group[0]), item.description, re.IGNORECASE) is not None
 					if found:
-						qualified_subtitle = item
-						break
-		
-		if qualified_subtitle:
-			return qualified_subtitle
+						ranked_subtitles.append(item)
+
+		return ranked_subtitles
+
+	def get_qualified(self, video_info):
+		ranked_subtitles = self.get_ranked(video_info)
+		if ranked_subtitles:
+			return ranked_subtitles[0]
 
 		raise SubtitlesNotFoundException('Qualified subtitle not found')
@@ -0,0 +1,131 @@
+import re
+
+import pytest
+
+requests = pytest.importorskip('requests')
+pytest.importorskip('guessit')
+
+import resilience  # noqa: E402
+from exceptions import TooManyTriesException  # noqa: E402
+from providers.bsplayer import BSPlayer  # noqa: E402
+from session import BSPlayerSession  # noqa: E402
+
+SAVED_URL = BSPlayer.API_URL_TEMPLATE.format(sub_domain='s1')
+
+
+class Logger:
+	def debug(self, *args, **kwargs):
+		pass
+
+	info = error = exception = debug
+
+
+class Response:
+	def __init__(self, body):
+		self.content = ('<?xml version="1.0" encoding="UTF-8"?><Envelope><Body><response>'
+						f'<return>{body}</return></response></Body></Envelope>').encode('utf-8')
+
+
+class FakeTransport:
+	# Answers like the BS.Player API, a handle is only valid once it was handed out by logIn
+	def __init__(self, valid_handles=(), down_urls=()):
+		self.valid_handles = set(valid_handles)
+		self.down_urls = set(down_urls)
+		self.calls = []
+		self.logins = 0
+
+	def post(self, url, data=None, headers=None, timeout=None, proxy=None):
+		func_name = headers['SOAPAction'].strip('"').split('#')[1]
+		handle = re.search(r'<handle>(.*?)</handle>', data)
+		self.calls.append((func_name, url, handle.group(1) if handle else None))
+		if url in self.down_urls:
+			raise requests.exceptions.ConnectionError(url)
+
+		if func_name == 'logIn':
+			self.logins += 1
+			token = f'token-{self.logins}'
+			self.valid_handles.add(token)
+			return Response(f'<status>OK</status><data>{token}</data>')
+		if func_name == 'logOut':
+			return Response('<status>OK</status>')
+		if handle.group(1) not in self.valid_handles:
+			return Response('<result><status>Invalid handle</status></result>')
+		return Response('<result><status>Not found</status></result>')
+
+
+@pytest.fixture(autouse=True)
+def breakers(monkeypatch):
+	monkeypatch.setattr(resilience, '_breakers', {})
+	monkeypatch.setitem(resilience.settings, 'backoff_base', 0)
+	monkeypatch.setitem(resilience.settings, 'failure_threshold', 3)
+
+
+@pytest.fixture
+def session(tmp_path):
+	session = BSPlayerSession(str(tmp_path / 'session.json'))
+	session.save('saved-token', SAVED_URL, None)
+	return session
+
+
+def search(bsplayer):
+	return bsplayer.handle_request('searchSubtitles', '<movieHash>0</movieHash>')
+
+
+def test_reuses_a_saved_session(session):
+	transport = FakeTransport(valid_handles=['saved-token'])
+	with BSPlayer(Logger(), None, tries=3, session=session, transport=transport) as bsplayer:
+		search(bsplayer)
+
+	assert transport.logins == 0
+	assert transport.calls == [('searchSubtitles', SAVED_URL, 'saved-token')]
+
+
+def test_rejected_handle_logs_in_again(session):
+	transport = FakeTransport()
+	with BSPlayer(Logger(), None, tries=3, session=session, transport=transport) as bsplayer:
+		root = search(bsplayer)
+
+	assert root.find('.//return//status').text == 'Not found'
+	assert [call[0] for call in transport.calls] == ['searchSubtitles', 'logIn', 'searchSubtitles']
+	assert transport.calls[-1][2] == 'token-1'
+	assert BSPlayerSession(session.session_file).load()
+	assert session.token == 'token-1'
+
+
+def test_unreachable_session_logs_in_on_another_mirror(session):
+	transport = FakeTransport(valid_handles=['saved-token'], down_urls=[SAVED_URL])
+	with BSPlayer(Logger(), None, tries=3, session=session, transport=transport) as bsplayer:
+		search(bsplayer)
+		assert bsplayer.search_url != SAVED_URL
+
+	assert [call[0] for call in transport.calls] == ['searchSubtitles'] * 3 + ['logIn', 'searchSubtitles']
+	assert transport.calls[-1][1:] == (bsplayer.search_url, 'token-1')
+	assert session.search_url == bsplayer.search_url
+
+
+def test_unreachable_fresh_session_is_not_retried(tmp_path):
+	transport = FakeTransport()
+	with BSPlayer(Logger(), None, tries=3, session=BSPlayerSession(str(tmp_path / 'session.json')), transport=transport) as bsplayer:
+		transport.down_urls.add(bsplayer.search_url)
+		with pytest.raises(TooManyTriesException):
+			search(bsplayer)
+
+	assert transport.logins == 1
+
+
+def test_saved_session_is_not_logged_out(tmp_path):
+	transport = FakeTransport()
+	with BSPlayer(Logger(), None, tries=3, session=BSPlayerSession(str(tmp_path / 'session.json')), transport=transport) as bsplayer:
+		search(bsplayer)
+
+	assert 'logOut' not in [call[0] for call in transport.calls]
+
+
+def test_session_that_could_not_be_saved_is_logged_out(tmp_path):
+	# The folder does not exist, the token cannot be kept for the next run
+	session = BSPlayerSession(str(tmp_path / 'missing' / 'session.json'))
+	transport = FakeTransport()
+	with BSPlayer(Logger(), None, tries=3, session=session, transport=transport) as bsplayer:
+		search(bsplayer)
+
+	assert [call[0] for call in transport.calls] == ['logIn', 'searchSubtitles', 'logOut']
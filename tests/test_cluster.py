@@ -0,0 +1,180 @@
+import os
+import time
+
+import pytest
+
+from cluster import Cluster
+
+SEARCH_FOLDER = '/media'
+
+
+def video_files(count=40):
+	return [f'{SEARCH_FOLDER}/Show/episode {index}.mkv' for index in range(count)]
+
+
+@pytest.fixture
+def nodes(tmp_path):
+	lease_folder = str(tmp_path)
+	node_a = Cluster('a', ['a', 'b'], lease_folder, SEARCH_FOLDER, lease_ttl=60)
+	node_b = Cluster('b', ['a', 'b'], lease_folder, SEARCH_FOLDER, lease_ttl=60)
+	return node_a, node_b
+
+
+def expire(path, ttl=60):
+	past = time.time() - ttl - 1
+	os.utime(path, (past, past))
+
+
+def test_owner_is_stable_and_shared(nodes):
+	node_a, node_b = nodes
+	owners = {node_a.owner(video_path) for video_path in video_files()}
+	assert owners == {'a', 'b'}
+	assert all(node_a.owner(video_path) == node_b.owner(video_path) for video_path in video_files())
+
+
+def test_acquire_is_exclusive(nodes):
+	node_a, node_b = nodes
+	video_path = video_files(1)[0]
+	assert node_a.acquire(video_path)
+	assert not node_b.acquire(video_path)
+	assert not node_a.acquire(video_path)
+
+	node_a.release(video_path)
+	assert node_b.acquire(video_path)
+
+
+def test_expired_lease_is_taken_over(nodes):
+	node_a, node_b = nodes
+	video_path = video_files(1)[0]
+	assert node_a.acquire(video_path)
+	expire(node_a.lease_file(video_path))
+
+	assert node_b.acquire(video_path)
+	# The previous holder finds out when renewing and does not touch the new lease
+	assert not node_a.renew(video_path)
+	node_a.release(video_path)
+	assert os.path.exists(node_b.lease_file(video_path))
+	assert node_b.renew(video_path)
+	assert [name for name in os.listdir(node_a.lease_folder) if name.endswith('.stale')] == []
+
+
+def test_renew_keeps_the_lease(nodes):
+	node_a, node_b = nodes
+	video_path = video_files(1)[0]
+	assert node_a.acquire(video_path)
+	expire(node_a.lease_file(video_path))
+
+	assert node_a.renew(video_path)
+	assert not node_b.acquire(video_path)
+
+
+def test_release_all(nodes):
+	node_a, node_b = nodes
+	files = video_files(5)
+	assert all(node_a.acquire(video_path) for video_path in files)
+	node_a.release()
+	assert all(node_b.acquire(video_path) for video_path in files)
+
+
+def test_heartbeat(nodes):
+	node_a, node_b = nodes
+	assert node_b.alive_nodes() == {'a': False, 'b': False}
+	node_a.heartbeat()
+	assert node_b.is_alive('a')
+
+	expire(os.path.join(node_a.lease_folder, 'nodes', 'a'))
+	assert not node_b.is_alive('a')
+	# Throttled heartbeats still refresh once the file is stale enough
+	node_a._heartbeat = 0
+	node_a.heartbeat(force=False)
+	assert node_b.is_alive('a')
+
+
+def test_heartbeat_survives_share_errors(nodes):
+	node_a, node_b = nodes
+	nodes_folder = os.path.join(node_a.lease_folder, 'nodes')
+	os.rmdir(nodes_folder)
+	with open(nodes_folder, 'w'):
+		pass
+
+	node_a.heartbeat()
+	assert not node_a.renew(video_files(1)[0])
+
+
+def test_steal_from_dead_node(nodes):
+	node_a, node_b = nodes
+	node_a.heartbeat()
+	files_b = [video_path for video_path in video_files() if node_a.owner(video_path) == 'b']
+
+	stolen = node_a.steal(files_b, idle=False)
+	assert stolen == files_b
+	assert not any(node_b.acquire(video_path) for video_path in files_b)
+
+
+def test_steal_from_live_node_only_when_idle(nodes):
+	node_a, node_b = nodes
+	node_a.heartbeat()
+	node_b.heartbeat()
+	files_b = [video_path for video_path in video_files() if node_a.owner(video_path) == 'b']
+
+	assert node_a.steal(files_b, idle=False) == []
+	stolen = node_a.steal(files_b, idle=True, steal_limit=2)
+	assert stolen == files_b[:2]
+
+
+def scanned(files):
+	return [(video_path, ['spa']) for video_path in files]
+
+
+def test_claim_own_files(nodes):
+	node_a, node_b = nodes
+	node_b.heartbeat()
+	files = video_files()
+	claimed = [video_path for video_path, languages in node_a.claim(scanned(files))]
+	assert claimed == [video_path for video_path in files if node_a.owner(video_path) == 'a']
+	assert node_a.is_alive('a')
+
+
+def test_claim_steals_from_dead_nodes_while_scanning(nodes):
+	node_a, node_b = nodes
+	files = video_files()
+	stream = node_a.claim(scanned(files), steal_limit=3)
+	first_b = next(video_path for video_path in files if node_a.owner(video_path) == 'b')
+	# Taken as soon as it is scanned, not at the end
+	taken = []
+	for video_path, languages in stream:
+		taken.append(video_path)
+		if video_path == first_b:
+			break
+	assert taken == files[:files.index(first_b) + 1]
+
+	taken += [video_path for video_path, languages in stream]
+	files_b = [video_path for video_path in taken if node_a.owner(video_path) == 'b']
+	assert len(files_b) == 3
+	assert len(taken) == len([video_path for video_path in files if node_a.owner(video_path) == 'a']) + 3
+
+
+def test_claim_steals_from_live_nodes_only_when_idle(nodes):
+	node_a, node_b = nodes
+	node_b.heartbeat()
+	files = video_files()
+	files_b = [video_path for video_path in files if node_a.owner(video_path) == 'b']
+
+	# With files of its own the node leaves the live node alone
+	claimed = [video_path for video_path, languages in node_a.claim(scanned(files))]
+	assert not set(claimed) & set(files_b)
+	node_a.release()
+
+	# With nothing of its own it helps, within the idle buffer
+	stolen = [video_path for video_path, languages in node_a.claim(scanned(files_b), idle_limit=4)]
+	assert stolen == files_b[:4]
+
+
+def test_claim_skips_leased_files(nodes):
+	node_a, node_b = nodes
+	files = video_files()
+	own = [video_path for video_path in files if node_a.owner(video_path) == 'a']
+	assert node_b.acquire(own[0])
+
+	claimed = [video_path for video_path, languages in node_a.claim(scanned(own))]
+	assert claimed == own[1:]
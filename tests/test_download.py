@@ -0,0 +1,149 @@
+import os
+import queue
+import sys
+import threading
+import types
+
+import pytest
+
+pytest.importorskip('logbook')
+pytest.importorskip('babelfish')
+
+import cluster  # noqa: E402
+import download  # noqa: E402
+
+
+class FakeChain:
+	instances = []
+
+	def __init__(self, proxy_pool, **kwargs):
+		self.processed = []
+		self.closed = False
+		FakeChain.instances.append(self)
+
+	def process(self, video_path, languages):
+		self.processed.append(video_path)
+		return True
+
+	def close(self):
+		self.closed = True
+
+
+@pytest.fixture
+def chain(monkeypatch):
+	# Stands in for the providers, download() imports the chain on first use
+	FakeChain.instances = []
+	module = types.ModuleType('chain')
+	module.ProviderChain = FakeChain
+	monkeypatch.setitem(sys.modules, 'chain', module)
+	return FakeChain
+
+
+@pytest.fixture
+def library(tmp_path):
+	search_folder = tmp_path / 'media'
+	search_folder.mkdir()
+	video_files = []
+	for index in range(6):
+		video_file = search_folder / f'Movie {index} (2020).mkv'
+		video_file.write_bytes(b'')
+		video_files.append(str(video_file))
+	return str(search_folder), video_files
+
+
+def run(search_folder, timeout=10, **kwargs):
+	# A worker that dies leaves download() blocked on the queue, so never wait forever
+	options = dict(age=None, embedded=False, language='spa', use_proxy=False, file_log=False, scan_queue_size=1, provider_workers=1)
+	options.update(kwargs)
+	thread = threading.Thread(target=download.download, args=(search_folder,), kwargs=options, daemon=True)
+	thread.start()
+	thread.join(timeout)
+	assert not thread.is_alive(), 'download() did not finish'
+
+
+def processed(chain):
+	return sorted(video_path for instance in chain.instances for video_path in instance.processed)
+
+
+def test_process_queue(chain):
+	video_queue = queue.Queue()
+	pending_files = []
+	outcomes = {'/media/found.mkv': True, '/media/missing.mkv': False}
+
+	class Chain(FakeChain):
+		def process(self, video_path, languages):
+			super().process(video_path, languages)
+			if video_path not in outcomes:
+				raise RuntimeError('Provider error')
+			return outcomes[video_path]
+
+	for video_path in ('/media/found.mkv', '/media/missing.mkv', '/media/error.mkv'):
+		video_queue.put((video_path, ['spa']))
+	video_queue.put(None)
+	video_queue.put(('/media/after-stop.mkv', ['spa']))
+
+	download.process_queue(video_queue, lambda: Chain(None), pending_files)
+	assert len(chain.instances) == 1
+	assert chain.instances[0].processed == ['/media/found.mkv', '/media/missing.mkv', '/media/error.mkv']
+	assert chain.instances[0].closed
+	assert pending_files == ['/media/missing.mkv', '/media/error.mkv']
+	assert video_queue.get_nowait() == ('/media/after-stop.mkv', ['spa'])
+
+
+def test_chain_is_only_opened_when_there_is_work(tmp_path, chain):
+	run(str(tmp_path), provider_workers=3)
+	assert chain.instances == []
+
+
+def test_every_file_is_handed_to_one_worker(library, chain):
+	search_folder, video_files = library
+	run(search_folder, provider_workers=3, scan_queue_size=1)
+	assert processed(chain) == sorted(video_files)
+	assert all(instance.closed for instance in chain.instances)
+
+
+def test_workers_stop_when_the_scan_fails(monkeypatch, library, chain):
+	search_folder, video_files = library
+
+	class FailingScan(download.GetFiles):
+		def iter_qualified(self):
+			yield video_files[0], ['spa']
+			raise OSError('Share unavailable')
+
+	monkeypatch.setattr(download, 'GetFiles', FailingScan)
+	run(search_folder, provider_workers=2)
+	assert processed(chain) == [video_files[0]]
+	assert all(instance.closed for instance in chain.instances)
+
+
+def test_lease_folder_errors_do_not_stop_the_workers(monkeypatch, tmp_path, library, chain):
+	search_folder, video_files = library
+	renew = cluster.Cluster.renew
+	failures = []
+
+	def flaky_renew(self, video_path):
+		if len(failures) < 2:
+			failures.append(video_path)
+			raise OSError('Share unavailable')
+		return renew(self, video_path)
+
+	monkeypatch.setattr(cluster.Cluster, 'renew', flaky_renew)
+	run(search_folder, cluster_node='a', cluster_nodes=['a'], cluster_lease_folder=str(tmp_path / 'leases'))
+
+	assert len(failures) == 2
+	assert processed(chain) == sorted(set(video_files) - set(failures))
+	assert all(instance.closed for instance in chain.instances)
+	# Every lease is given back at the end of the run
+	assert [name for name in os.listdir(tmp_path / 'leases') if name.endswith('.lease')] == []
+
+
+def test_cluster_run_takes_own_and_dead_node_files(tmp_path, library, chain):
+	search_folder, video_files = library
+	lease_folder = str(tmp_path / 'leases')
+	node = cluster.Cluster('a', ['a', 'b'], lease_folder, search_folder)
+	own = [video_path for video_path in video_files if node.owner(video_path) == 'a']
+
+	# Node b never sent a heartbeat, one of its files is taken
+	run(search_folder, cluster_node='a', cluster_nodes=['a', 'b'], cluster_lease_folder=lease_folder, cluster_steal_limit=1)
+	assert len(processed(chain)) == len(own) + 1
+	assert set(own) <= set(processed(chain))
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('logbook')
+pytest.importorskip('babelfish')
+
+from files import GetFiles  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Logger:
+	def debug(self, *args, **kwargs):
+		pass
+
+	info = debug
+
+
+def touch(path):
+	path.parent.mkdir(parents=True, exist_ok=True)
+	path.write_bytes(b'')
+	return str(path)
+
+
+def test_iter_qualified(tmp_path):
+	missing_both = touch(tmp_path / 'Movie (2020).mp4')
+	touch(tmp_path / 'Show' / 'Show S01E01.avi')
+	touch(tmp_path / 'Show' / 'Show S01E01.spa.srt')
+	touch(tmp_path / 'Show' / 'Show S01E01.eng.srt')
+	missing_eng = touch(tmp_path / 'Other (2019).mkv')
+	touch(tmp_path / 'Other (2019).spa.srt')
+	touch(tmp_path / '.hidden.mkv')
+	touch(tmp_path / 'notes.txt')
+
+	files = GetFiles(str(tmp_path), ['spa', 'eng'], age=None, embedded=False, logger=Logger())
+	assert sorted(files.iter_qualified()) == sorted([(missing_both, ['spa', 'eng']), (missing_eng, ['eng'])])
+	assert files.stats['subtitled'] == 1
+	assert files.stats['hidden'] == 1
+
+
+def test_scan_does_not_load_heavy_dependencies(tmp_path):
+	touch(tmp_path / 'Movie (2020).mp4')
+	code = (
+		'import sys, download\n'
+		'from files import GetFiles\n'
+		f'list(GetFiles({str(tmp_path)!r}, "spa", None, True, download.logger).iter_qualified())\n'
+		'print(sorted(name for name in ("babelfish", "enzyme", "guessit", "requests", "proxybroker") if name in sys.modules))\n'
+	)
+	result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+	assert result.stdout.strip() == '[]'
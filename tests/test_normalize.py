@@ -0,0 +1,94 @@
+import io
+
+import pytest
+
+from exceptions import InvalidSubtitleException
+from normalize import SubtitleNormalizer, detect_encoding, write_subtitle
+
+CUE = '{index}\r\n00:00:{index:02d},000 --> 00:00:{index:02d},500\r\n{text}\r\n\r\n'
+
+
+def subtitle(*texts):
+	return ''.join(CUE.format(index=index + 1, text=text) for index, text in enumerate(texts))
+
+
+def normalize(data, **kwargs):
+	normalizer = SubtitleNormalizer(**kwargs)
+	destination = io.BytesIO()
+	validator = normalizer.normalize(io.BytesIO(data), destination)
+	return normalizer, validator, destination.getvalue().decode('utf-8')
+
+
+@pytest.mark.parametrize('data, encoding', [
+	('Canción'.encode('utf-8'), 'utf-8'),
+	(b'\xef\xbb\xbf' + 'Canción'.encode('utf-8'), 'utf-8-sig'),
+	('Canción'.encode('utf-16'), 'utf-16'),
+	('Canción – €'.encode('cp1252'), 'cp1252'),
+	(b'Canci\xf3n \x81', 'iso-8859-1'),
+	(b'plain ascii', 'utf-8'),
+])
+def test_detect_encoding(data, encoding):
+	assert detect_encoding(data) == encoding
+
+
+def test_utf8_character_split_at_sample_end():
+	data = subtitle('ñ' * 10).encode('utf-8')
+	# Cut the sample in the middle of the two bytes of an 'ñ'
+	split = data.index('ñ'.encode('utf-8')) + 1
+	normalizer, validator, text = normalize(data, sample_size=split, chunk_size=3)
+	assert normalizer.encoding == 'utf-8'
+	assert 'ñ' * 10 in text
+
+
+def test_ascii_sample_then_cp1252():
+	data = subtitle(*['plain ascii line'] * 50).encode('ascii') + CUE.format(index=51, text='Canción €').encode('cp1252')
+	normalizer, validator, text = normalize(data, sample_size=64, chunk_size=16)
+	assert normalizer.encoding == 'cp1252'
+	assert 'Canción €' in text
+	assert '�' not in text
+	assert validator.cues == 51
+
+
+def test_crlf_split_across_chunks():
+	data = subtitle('first', 'second', 'third').encode('utf-8')
+	first_cr = data.index(b'\r\n')
+	# Every chunk boundary falls between '\r' and '\n' at least once
+	for chunk_size in range(1, 8):
+		normalizer, validator, text = normalize(data, sample_size=first_cr + 1, chunk_size=chunk_size)
+		assert '\r' not in text
+		assert '\n\n\n' not in text
+		assert text == subtitle('first', 'second', 'third').replace('\r\n', '\n')
+		assert validator.cues == 3
+		assert validator.errors == 0
+
+
+def test_lone_cr_line_endings():
+	data = subtitle('first', 'second').replace('\r\n', '\r').encode('utf-8')
+	normalizer, validator, text = normalize(data, chunk_size=5)
+	assert text == subtitle('first', 'second').replace('\r\n', '\n')
+	assert validator.cues == 2
+
+
+def test_bom_is_dropped():
+	data = b'\xef\xbb\xbf' + subtitle('text').encode('utf-8')
+	normalizer, validator, text = normalize(data)
+	assert not text.startswith('\ufeff')
+
+
+def test_write_subtitle(tmp_path):
+	filename = str(tmp_path / 'movie.spa.srt')
+	write_subtitle(io.BytesIO(subtitle('Hola').encode('cp1252')), filename)
+	with open(filename, 'rb') as f:
+		assert f.read().decode('utf-8') == subtitle('Hola').replace('\r\n', '\n')
+	assert [path.name for path in tmp_path.iterdir()] == ['movie.spa.srt']
+
+
+@pytest.mark.parametrize('data', [
+	b'<html><body>Not found</body></html>',
+	('<html>\n' * 10 + '00:00:01,000 --> 00:00:02,000\n').encode('utf-8'),
+])
+def test_write_subtitle_rejects_other_files(tmp_path, data):
+	filename = str(tmp_path / 'movie.spa.srt')
+	with pytest.raises(InvalidSubtitleException):
+		write_subtitle(io.BytesIO(data), filename)
+	assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,122 @@
+import pytest
+
+import resilience
+from exceptions import CircuitOpenException
+from resilience import CircuitBreaker, RetrySession
+
+
+class Clock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	clock = Clock()
+	monkeypatch.setattr(resilience.time, 'monotonic', clock)
+	return clock
+
+
+def open_breaker(breaker):
+	for _ in range(breaker.failure_threshold):
+		breaker.before_call()
+		breaker.failure()
+
+
+def test_opens_after_threshold(clock):
+	breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=60)
+	for _ in range(2):
+		breaker.before_call()
+		breaker.failure()
+	assert breaker.state == CircuitBreaker.CLOSED
+	assert not breaker.is_open()
+
+	breaker.before_call()
+	breaker.failure()
+	assert breaker.state == CircuitBreaker.OPEN
+	assert breaker.is_open()
+	with pytest.raises(CircuitOpenException):
+		breaker.before_call()
+
+
+def test_success_resets_failures(clock):
+	breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=60)
+	breaker.before_call()
+	breaker.failure()
+	breaker.before_call()
+	breaker.success()
+	breaker.before_call()
+	breaker.failure()
+	assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_a_single_probe_through(clock):
+	breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=60)
+	open_breaker(breaker)
+
+	clock.now += 61
+	assert not breaker.is_open()
+	breaker.before_call()
+	assert breaker.state == CircuitBreaker.HALF_OPEN
+	# The probe is in flight, everybody else keeps waiting
+	assert breaker.is_open()
+	with pytest.raises(CircuitOpenException):
+		breaker.before_call()
+
+	breaker.success()
+	assert breaker.state == CircuitBreaker.CLOSED
+	assert not breaker.is_open()
+
+
+def test_failed_probe_opens_again(clock):
+	breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=60)
+	open_breaker(breaker)
+
+	clock.now += 61
+	breaker.before_call()
+	breaker.failure()
+	assert breaker.state == CircuitBreaker.OPEN
+	with pytest.raises(CircuitOpenException):
+		breaker.before_call()
+
+	clock.now += 61
+	breaker.before_call()
+	assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+class FailingSession:
+	def __init__(self, error):
+		self.error = error
+		self.calls = 0
+
+	def get(self, url, **kwargs):
+		self.calls += 1
+		raise self.error
+
+
+def test_probe_is_not_stuck_on_unexpected_errors(clock):
+	pytest.importorskip('requests')
+
+	breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=60)
+	open_breaker(breaker)
+	clock.now += 61
+
+	session = RetrySession(FailingSession(ValueError('not a retry error')), breaker, tries=3)
+	with pytest.raises(ValueError):
+		session.get('http://example.invalid/')
+	assert session.session.calls == 1
+	assert breaker.state == CircuitBreaker.OPEN
+
+	# Once the timeout passes again a new probe is allowed
+	clock.now += 61
+	breaker.before_call()
+	assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_backoff_is_capped(monkeypatch):
+	monkeypatch.setitem(resilience.settings, 'backoff_base', 1.0)
+	monkeypatch.setitem(resilience.settings, 'backoff_cap', 5.0)
+	assert all(0 <= resilience.backoff(attempt) <= 5.0 for attempt in range(20))
@@ -0,0 +1,147 @@
+import http.server
+import socket
+import threading
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+import resolver  # noqa: E402
+from resolver import DNSCache  # noqa: E402
+from transport import Transport  # noqa: E402
+
+HOST = 'subtitles.test'
+
+
+class Clock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	clock = Clock()
+	monkeypatch.setattr(resolver.time, 'monotonic', clock)
+	return clock
+
+
+@pytest.fixture
+def dns(monkeypatch):
+	# Made up names resolve to the given addresses, everything else goes to the system resolver
+	records = {}
+	lookups = []
+	getaddrinfo = socket.getaddrinfo
+
+	def fake_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+		if host in records:
+			lookups.append(host)
+			return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, port)) for address in records[host]]
+		return getaddrinfo(host, port, family, type, proto, flags)
+
+	monkeypatch.setattr(socket, 'getaddrinfo', fake_getaddrinfo)
+	fake_getaddrinfo.records = records
+	fake_getaddrinfo.lookups = lookups
+	return fake_getaddrinfo
+
+
+@pytest.fixture
+def http_server():
+	handler = type('Handler', (http.server.BaseHTTPRequestHandler,), {
+		'protocol_version': 'HTTP/1.1',
+		'do_GET': lambda self: (self.send_response(200), self.send_header('Content-Length', '0'), self.end_headers()),
+		'log_message': lambda self, *args: None,
+	})
+	# Threaded, a kept alive connection must not hold up the shutdown
+	server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+	server.daemon_threads = True
+	thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+	thread.start()
+	yield server
+	server.shutdown()
+	server.server_close()
+
+
+def test_entries_expire(clock, dns):
+	dns.records[HOST] = ['10.0.0.1']
+	cache = DNSCache(ttl=60)
+	assert cache.resolve(HOST, 80) == ['10.0.0.1']
+
+	dns.records[HOST] = ['10.0.0.2']
+	clock.now += 59
+	assert cache.resolve(HOST, 80) == ['10.0.0.1']
+	clock.now += 2
+	assert cache.resolve(HOST, 80) == ['10.0.0.2']
+	assert dns.lookups == [HOST, HOST]
+
+
+def test_least_recently_used_entry_is_dropped(clock, dns):
+	for index, host in enumerate(('a.test', 'b.test', 'c.test')):
+		dns.records[host] = [f'10.0.0.{index + 1}']
+	cache = DNSCache(ttl=60, maxsize=2)
+
+	cache.resolve('a.test', 80)
+	cache.resolve('b.test', 80)
+	cache.resolve('a.test', 80)
+	cache.resolve('c.test', 80)
+	assert len(cache) == 2
+
+	del dns.lookups[:]
+	cache.resolve('a.test', 80)
+	cache.resolve('b.test', 80)
+	assert dns.lookups == ['b.test']
+
+
+def test_resolution_errors_are_not_cached(dns):
+	cache = DNSCache(ttl=60)
+	assert cache.resolve('missing.invalid', 80) is None
+	assert len(cache) == 0
+
+
+def test_transport_resolves_once_per_ttl(dns, http_server):
+	dns.records[HOST] = ['127.0.0.1']
+	transport = Transport(dns_ttl=60)
+	url = f'http://{HOST}:{http_server.server_address[1]}/'
+	try:
+		for _ in range(3):
+			assert transport.get(url, timeout=5).status_code == 200
+			# New connections each time, still a single lookup
+			transport.session.close()
+	finally:
+		transport.close()
+	assert dns.lookups == [HOST]
+
+
+def test_connect_tries_the_next_address(dns, http_server):
+	# Nothing listens on 127.0.0.2 for the server's port
+	dns.records[HOST] = ['127.0.0.2', '127.0.0.1']
+	transport = Transport(dns_ttl=60)
+	try:
+		assert transport.get(f'http://{HOST}:{http_server.server_address[1]}/', timeout=5).status_code == 200
+	finally:
+		transport.close()
+
+
+def test_failed_connect_forgets_the_host(dns, http_server):
+	port = http_server.server_address[1]
+	dns.records[HOST] = ['127.0.0.2']
+	transport = Transport(dns_ttl=60)
+	try:
+		with pytest.raises(requests.exceptions.ConnectionError):
+			transport.get(f'http://{HOST}:{port}/', timeout=5)
+		assert len(transport.dns_cache) == 0
+
+		# The next connection resolves again and finds the new address
+		dns.records[HOST] = ['127.0.0.1']
+		assert transport.get(f'http://{HOST}:{port}/', timeout=5).status_code == 200
+	finally:
+		transport.close()
+	assert dns.lookups == [HOST, HOST]
+
+
+def test_system_resolver_is_left_alone(dns):
+	getaddrinfo = socket.getaddrinfo
+	Transport(dns_ttl=60).close()
+	assert socket.getaddrinfo is getaddrinfo
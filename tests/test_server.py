@@ -0,0 +1,90 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+pytest.importorskip('logbook')
+
+from server import Job, JobServer  # noqa: E402
+
+
+class RecordingWorker:
+	def __init__(self):
+		self.jobs = {}
+
+	def submit(self, video_path, priority=0):
+		job = Job(video_path, priority)
+		self.jobs[job.id] = job
+		return job
+
+	def get_job(self, job_id):
+		return self.jobs.get(job_id)
+
+
+@pytest.fixture(scope='module')
+def running_server():
+	server = JobServer(('127.0.0.1', 0), None)
+	thread = threading.Thread(target=server.serve_forever, daemon=True)
+	thread.start()
+	yield server
+	server.shutdown()
+	server.server_close()
+
+
+@pytest.fixture
+def server(running_server):
+	running_server.worker = RecordingWorker()
+	return running_server
+
+
+def request(server, method, path, body=None):
+	connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+	try:
+		connection.request(method, path, body=body)
+		response = connection.getresponse()
+		return response.status, json.loads(response.read().decode('utf-8'))
+	finally:
+		connection.close()
+
+
+def test_submit_and_get_jobs(server):
+	status, data = request(server, 'POST', '/jobs', json.dumps({'paths': ['/media/a.mkv', '/media/b.mkv'], 'priority': 2}))
+	assert status == 202
+	assert [job['path'] for job in data['jobs']] == ['/media/a.mkv', '/media/b.mkv']
+	assert all(job['priority'] == 2 and job['status'] == 'queued' for job in data['jobs'])
+
+	status, job = request(server, 'GET', f'/jobs/{data["jobs"][0]["id"]}')
+	assert status == 200
+	assert job['path'] == '/media/a.mkv'
+
+
+def test_submit_single_path(server):
+	status, data = request(server, 'POST', '/jobs', json.dumps({'path': '/media/a.mkv'}))
+	assert status == 202
+	assert [job['path'] for job in data['jobs']] == ['/media/a.mkv']
+
+
+@pytest.mark.parametrize('body', [
+	'{"paths": "/media/a.mkv"}',
+	'{"paths": []}',
+	'{"paths": ["/media/a.mkv", 1]}',
+	'{"paths": ["/media/a.mkv", ""]}',
+	'{"path": 1}',
+	'{"paths": ["/media/a.mkv"], "priority": "high"}',
+	'{"paths": ["/media/a.mkv"], "priority": Infinity}',
+	'["/media/a.mkv"]',
+	'"/media/a.mkv"',
+	'not json',
+	'{}',
+])
+def test_invalid_requests_queue_nothing(server, body):
+	status, data = request(server, 'POST', '/jobs', body)
+	assert status == 400
+	assert 'error' in data
+	assert server.worker.jobs == {}
+
+
+def test_unknown_job(server):
+	assert request(server, 'GET', '/jobs/missing')[0] == 404
+	assert request(server, 'POST', '/other', '{}')[0] == 404
@@ -0,0 +1,46 @@
+import json
+import os
+import threading
+import time
+
+from session import BSPlayerSession
+
+
+def test_save_and_load(tmp_path):
+	session_file = str(tmp_path / 'session.json')
+	BSPlayerSession(session_file).save('token', 'http://s1.api.bsplayer-subtitles.com/v1.php', 'proxy:8080')
+
+	session = BSPlayerSession(session_file)
+	assert session.load()
+	assert (session.token, session.search_url, session.proxy) == ('token', 'http://s1.api.bsplayer-subtitles.com/v1.php', 'proxy:8080')
+
+
+def test_expired_session(tmp_path):
+	session_file = str(tmp_path / 'session.json')
+	with open(session_file, 'w') as f:
+		json.dump({'token': 'token', 'search_url': 'url', 'proxy': None, 'created': time.time() - 120}, f)
+
+	assert not BSPlayerSession(session_file, ttl=60).load()
+	assert BSPlayerSession(session_file, ttl=300).load()
+
+
+def test_concurrent_saves_leave_one_valid_file(tmp_path):
+	session_file = str(tmp_path / 'session.json')
+	session = BSPlayerSession(session_file)
+
+	def save(worker):
+		for attempt in range(100):
+			session.save(f'token-{worker}-{attempt}', 'url', None)
+
+	workers = [threading.Thread(target=save, args=(worker,)) for worker in range(8)]
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join()
+
+	assert os.listdir(tmp_path) == ['session.json']
+	assert BSPlayerSession(session_file).load()
+
+	session.clear()
+	session.clear()
+	assert os.listdir(tmp_path) == []
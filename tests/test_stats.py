@@ -0,0 +1,115 @@
+import json
+import os
+import time
+
+import pytest
+
+import stats as stats_module
+from stats import ProviderStats
+
+BUCKETS = ['movie|new|group', 'movie|new', 'movie', '*']
+
+
+def record(stats, provider, hits, misses, seconds=1.0, buckets=BUCKETS):
+	for _ in range(hits):
+		stats.record(buckets, provider, True, seconds)
+	for _ in range(misses):
+		stats.record(buckets, provider, False, seconds)
+
+
+def test_unknown_providers_keep_their_order():
+	stats = ProviderStats(None)
+	assert stats.order(BUCKETS, ('bsplayer', 'subdivx')) == ['bsplayer', 'subdivx']
+	assert stats.estimate(BUCKETS, 'bsplayer') == (ProviderStats.DEFAULT_HIT_RATE, ProviderStats.DEFAULT_SECONDS, False)
+
+
+def test_order_by_expected_cost():
+	stats = ProviderStats(None, min_samples=10)
+	record(stats, 'bsplayer', hits=2, misses=18, seconds=1.0)
+	record(stats, 'subdivx', hits=15, misses=5, seconds=2.0)
+	assert stats.order(BUCKETS, ('bsplayer', 'subdivx')) == ['subdivx', 'bsplayer']
+
+
+def test_falls_back_to_wider_buckets():
+	stats = ProviderStats(None, min_samples=10)
+	# Plenty of samples for movies in general, only a few for this release group
+	record(stats, 'bsplayer', hits=20, misses=0, buckets=['movie|old|other', 'movie|old', 'movie', '*'])
+	record(stats, 'bsplayer', hits=0, misses=3)
+
+	hit_rate, seconds, known = stats.estimate(BUCKETS, 'bsplayer')
+	assert known
+	assert hit_rate == pytest.approx(21 / 25)
+
+	hit_rate, seconds, known = stats.estimate(['episode|new|group', 'episode|new', 'episode', '*'], 'bsplayer')
+	assert known
+	assert hit_rate == pytest.approx(21 / 25)
+
+
+def test_skip_and_explore(monkeypatch):
+	stats = ProviderStats(None, min_samples=10, skip_hit_rate=0.1, explore=0.2)
+	record(stats, 'subdivx', hits=0, misses=50)
+	record(stats, 'bsplayer', hits=10, misses=10)
+
+	monkeypatch.setattr(stats_module.random, 'random', lambda: 0.5)
+	assert stats.order(BUCKETS, ('bsplayer', 'subdivx')) == ['bsplayer']
+
+	# Now and then the skipped provider is tried again, in case it got better
+	monkeypatch.setattr(stats_module.random, 'random', lambda: 0.1)
+	assert stats.order(BUCKETS, ('bsplayer', 'subdivx')) == ['bsplayer', 'subdivx']
+
+
+def test_saves_every_few_records(tmp_path):
+	stats_file = str(tmp_path / 'stats.json')
+	stats = ProviderStats(stats_file, save_every=3)
+	record(stats, 'bsplayer', hits=1, misses=1)
+	assert not os.path.exists(stats_file)
+
+	record(stats, 'bsplayer', hits=1, misses=0)
+	with open(stats_file) as f:
+		assert json.load(f)['*']['bsplayer'] == {'attempts': 3, 'hits': 2, 'seconds': 3.0}
+	assert sorted(os.listdir(tmp_path)) == ['stats.json']
+
+
+def test_processes_sharing_the_file_keep_each_others_counts(tmp_path):
+	stats_file = str(tmp_path / 'stats.json')
+	batch = ProviderStats(stats_file, save_every=None)
+	server = ProviderStats(stats_file, save_every=None)
+
+	record(batch, 'bsplayer', hits=1, misses=1)
+	record(server, 'subdivx', hits=3, misses=0)
+	batch.save()
+	server.save()
+	record(batch, 'bsplayer', hits=1, misses=0)
+	batch.save()
+
+	saved = ProviderStats(stats_file).stats['*']
+	assert saved['bsplayer'] == {'attempts': 3, 'hits': 2, 'seconds': 3.0}
+	assert saved['subdivx'] == {'attempts': 3, 'hits': 3, 'seconds': 3.0}
+	# Each process also picks up what the other learned
+	assert batch.stats['*'] == saved
+
+
+def test_failed_save_keeps_the_counts(tmp_path):
+	stats_file = str(tmp_path / 'missing' / 'stats.json')
+	stats = ProviderStats(stats_file, save_every=None)
+	record(stats, 'bsplayer', hits=1, misses=0)
+	with pytest.raises(OSError):
+		stats.save()
+
+	os.mkdir(tmp_path / 'missing')
+	stats.save()
+	assert ProviderStats(stats_file).stats['*']['bsplayer']['attempts'] == 1
+
+
+def test_stale_lock_is_broken(tmp_path):
+	stats_file = str(tmp_path / 'stats.json')
+	lock_file = stats_file + '.lock'
+	open(lock_file, 'w').close()
+	past = time.time() - ProviderStats.LOCK_TIMEOUT - 1
+	os.utime(lock_file, (past, past))
+
+	stats = ProviderStats(stats_file, save_every=None)
+	record(stats, 'bsplayer', hits=1, misses=0)
+	stats.save()
+	assert os.path.exists(stats_file)
+	assert not os.path.exists(lock_file)
@@ -0,0 +1,84 @@
+import zipfile
+
+import pytest
+
+requests = pytest.importorskip('requests')
+pytest.importorskip('guessit')
+pytest.importorskip('bs4')
+pytest.importorskip('rarfile')
+
+from exceptions import CircuitOpenException, SubtitlesNotFoundException  # noqa: E402
+from providers.subdivx import Subdivx  # noqa: E402
+
+VIDEO_PATH = '/media/Movie (2020)/Movie.2020.1080p.BluRay.x264-GROUP.mkv'
+
+
+class Logger:
+	def debug(self, *args, **kwargs):
+		pass
+
+	info = warning = error = debug
+
+
+class Candidate:
+	def __init__(self, name, fetch_error=None, save_error=None):
+		self.page_link = f'https://www.subdivx.com/{name}'
+		self.fetch_error = fetch_error
+		self.save_error = save_error
+		self.saved = False
+
+	def fetch_archive(self, session, timeout, proxy):
+		if self.fetch_error is not None:
+			raise self.fetch_error
+		return object()
+
+	def save(self, archive, video_path, video_info):
+		if self.save_error is not None:
+			raise self.save_error
+		self.saved = True
+		return True
+
+
+class Results:
+	def __init__(self, candidates):
+		self.candidates = candidates
+
+	def get_ranked(self, video_info):
+		return self.candidates
+
+
+def download(monkeypatch, candidates, prefetch=3):
+	subdivx = Subdivx(Logger(), None, prefetch=prefetch, transport=object())
+	monkeypatch.setattr(subdivx, 'search_subtitles', lambda video_path, video_info: Results(candidates))
+	with subdivx:
+		return subdivx.download_by_path(VIDEO_PATH)
+
+
+def test_falls_through_to_the_next_candidate(monkeypatch):
+	candidates = [
+		Candidate('request-error', fetch_error=requests.exceptions.ConnectionError('reset')),
+		Candidate('bad-zip', save_error=zipfile.BadZipFile('not a zip')),
+		Candidate('good'),
+		Candidate('not-needed'),
+	]
+	assert download(monkeypatch, candidates)
+	assert [candidate.saved for candidate in candidates] == [False, False, True, False]
+
+
+def test_only_prefetched_candidates_are_tried(monkeypatch):
+	candidates = [Candidate('broken', save_error=ValueError('bad subtitle')), Candidate('good')]
+	with pytest.raises(SubtitlesNotFoundException):
+		download(monkeypatch, candidates, prefetch=1)
+	assert not candidates[1].saved
+
+
+def test_no_usable_candidate(monkeypatch):
+	candidates = [Candidate('timeout', fetch_error=requests.exceptions.Timeout('slow')), Candidate('broken', save_error=OSError('disk'))]
+	with pytest.raises(SubtitlesNotFoundException):
+		download(monkeypatch, candidates)
+
+
+def test_open_breaker_is_raised_for_the_chain(monkeypatch):
+	candidates = [Candidate('broken', save_error=ValueError('bad subtitle')), Candidate('down', fetch_error=CircuitOpenException('Subdivx'))]
+	with pytest.raises(CircuitOpenException):
+		download(monkeypatch, candidates)
@@ -0,0 +1,87 @@
+import threading
+
+# Defaults for the shared transport, set once per run from the config
+settings = {'pool_connections': 32, 'pool_maxsize': 10, 'dns_ttl': 300, 'dns_cache_size': 256}
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def configure(pool_connections=32, pool_maxsize=10, dns_ttl=300, dns_cache_size=256):
+	global _transport
+	new_settings = dict(pool_connections=pool_connections, pool_maxsize=pool_maxsize, dns_ttl=dns_ttl, dns_cache_size=dns_cache_size)
+	with _transport_lock:
+		if new_settings == settings:
+			return
+		settings.update(new_settings)
+		# Long running processes (the service, the server) get a transport built with the new settings
+		if _transport is not None:
+			_transport.close()
+			_transport = None
+
+
+def get_transport():
+	global _transport
+	with _transport_lock:
+		if _transport is None:
+			_transport = Transport(settings['pool_connections'], settings['pool_maxsize'], settings['dns_ttl'], settings['dns_cache_size'])
+		return _transport
+
+
+def get_active_transport():
+	# None until a provider has needed the network
+	return _transport
+
+
+def proxy_settings(proxy):
+	if proxy is None:
+		return None
+	return {'http': proxy, 'https': proxy}
+
+
+class Transport:
+	def __init__(self, pool_connections=32, pool_maxsize=10, dns_ttl=300, dns_cache_size=256):
+		import requests
+		from requests.adapters import HTTPAdapter
+
+		# One pool per host, kept alive for every provider and every run in the same process
+		if dns_ttl is None:
+			self.dns_cache = None
+			self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+		else:
+			from resolver import CachedResolutionAdapter, DNSCache
+
+			# Only connections opened by this transport resolve through the cache
+			self.dns_cache = DNSCache(dns_ttl, dns_cache_size)
+			self.adapter = CachedResolutionAdapter(self.dns_cache, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+		self.session = requests.Session()
+		self.session.mount('http://', self.adapter)
+		self.session.mount('https://', self.adapter)
+		self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+
+	def get(self, url, proxy=None, **kwargs):
+		return self.session.get(url, proxies=proxy_settings(proxy), **kwargs)
+
+	def post(self, url, proxy=None, **kwargs):
+		return self.session.post(url, proxies=proxy_settings(proxy), **kwargs)
+
+	def close(self):
+		self.session.close()
+
+	def pools(self):
+		managers = [self.adapter.poolmanager] + list(self.adapter.proxy_manager.values())
+		for manager in managers:
+			for key in list(manager.pools.keys()):
+				try:
+					yield manager.pools[key]
+				except KeyError:
+					continue
+
+	def stats(self):
+		connections = 0
+		requests_sent = 0
+		for pool in self.pools():
+			connections += pool.num_connections
+			requests_sent += pool.num_requests
+
+		return {'requests': requests_sent, 'connections': connections, 'reused': max(0, requests_sent - connections)}
@@ -1,4 +1,5 @@
 from datetime import datetime
+from importlib import reload
 
 import config as cfg
 from download import download
@@ -25,7 +26,9 @@ class SubtitlesService(win32serviceutil.ServiceFramework):
 		rc = None
 		while rc != win32event.WAIT_OBJECT_0:
 			try:
-				download(cfg.SEARCH_FOLDER, age=cfg.AGE, embedded=cfg.EMBEDDED, bsplayer_timeout=cfg.BSPLAYER_TIMEOUT, bsplayer_tries=cfg.BSPLAYER_TRIES, verbose=cfg.VERBOSE, file_log=cfg.FILE_LOG, file_log_folder=cfg.FILE_LOG_FOLDER, use_proxy=cfg.USE_PROXY)
+				# Pick up config changes without restarting the service
+				reload(cfg)
+				download(cfg.SEARCH_FOLDER, age=cfg.AGE, language=cfg.LANGUAGES, embedded=cfg.EMBEDDED, bsplayer_timeout=cfg.BSPLAYER_TIMEOUT, bsplayer_tries=cfg.BSPLAYER_TRIES, bsplayer_session_file=cfg.BSPLAYER_SESSION_FILE, bsplayer_session_ttl=cfg.BSPLAYER_SESSION_TTL, subdivx_prefetch=cfg.SUBDIVX_PREFETCH, provider_stats_file=cfg.PROVIDER_STATS_FILE, breaker_failures=cfg.BREAKER_FAILURES, breaker_reset_timeout=cfg.BREAKER_RESET_TIMEOUT, backoff_base=cfg.BACKOFF_BASE, backoff_cap=cfg.BACKOFF_CAP, pool_maxsize=cfg.POOL_MAXSIZE, dns_cache_ttl=cfg.DNS_CACHE_TTL, provider_workers=cfg.PROVIDER_WORKERS, scan_queue_size=cfg.SCAN_QUEUE_SIZE, verbose=cfg.VERBOSE, log_level=cfg.LOG_LEVEL, file_log=cfg.FILE_LOG, file_log_folder=cfg.FILE_LOG_FOLDER, use_proxy=cfg.USE_PROXY, cluster_node=cfg.CLUSTER_NODE, cluster_nodes=cfg.CLUSTER_NODES, cluster_lease_folder=cfg.CLUSTER_LEASE_FOLDER, cluster_lease_ttl=cfg.CLUSTER_LEASE_TTL, cluster_steal_limit=cfg.CLUSTER_STEAL_LIMIT)
 			finally:
 				rc = win32event.WaitForSingleObject(self.hWaitStop, cfg.WS_SLEEP * 1000)
 